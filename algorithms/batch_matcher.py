@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""batch_matcher.py
+
+Matching of many short words against a single deterministic finite automaton.
+When NumPy is available, a whole batch of words advances through the
+transition table at once, one column of characters per step; otherwise, each
+word is run on its own by the compiled automaton.
+
+Gustavo Zambonin & Matheus Ben-Hur de Melo Leite, UFSC, November 2015.
+"""
+
+from algorithms.compiled_automaton import CompiledAutomaton, DEAD, \
+    compile_automaton
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def match_batch(automaton, words, batch_size=65536, vectorized=True):
+    """Checks which words belong to the language of the automaton.
+
+    Arguments:
+        automaton: a determinized FiniteAutomaton or a CompiledAutomaton.
+        words: a list of strings.
+        batch_size: how many words are encoded in the same matrix, which
+            bounds the memory used by the vectorized path.
+        vectorized: whether NumPy should be used when it is installed.
+
+    Returns:
+        A list of booleans, true for each word accepted by the automaton.
+    """
+    if not isinstance(automaton, CompiledAutomaton):
+        automaton = compile_automaton(automaton)
+    if numpy is None or not vectorized or automaton.init_state == DEAD:
+        return [automaton.accepts(word) for word in words]
+    return numpy_match(automaton, words, batch_size).tolist()
+
+
+def numpy_match(automaton, words, batch_size):
+    """Advances all words in lockstep through the transition table. The
+    table is extended with a dead row, a column for unknown characters and
+    a padding column that keeps every state where it is, so words shorter
+    than the longest one in the batch simply stop moving. Words are sorted
+    by length before being cut in batches, to keep the padding small.
+
+    Returns:
+        A NumPy array of booleans, in the order of the given words.
+    """
+    size, width = len(automaton), automaton.width
+    unknown, padding = width, width + 1
+    table = numpy.empty((size + 1, width + 2), dtype=numpy.int32)
+    table[:size, :width] = numpy.frombuffer(
+        automaton.table, dtype=numpy.int32).reshape(size, width)
+    table[table == DEAD] = size
+    table[size, :] = size
+    table[:, unknown] = size
+    table[:, padding] = numpy.arange(size + 1)
+    finals = numpy.array([automaton.is_final(state)
+                          for state in range(size)] + [False])
+
+    symbols = {ord(s): c for s, c in automaton.columns.items() if len(s) == 1}
+    lookup = numpy.full(max(symbols, default=0) + 1, unknown,
+                        dtype=numpy.uint8 if width + 2 <= 256
+                        else numpy.uint16)
+    for code, column in symbols.items():
+        lookup[code] = column
+
+    lengths = numpy.fromiter((len(word) for word in words), dtype=numpy.int64,
+                             count=len(words))
+    order = numpy.argsort(lengths, kind='stable')
+    accepted = numpy.zeros(len(words), dtype=bool)
+
+    for start in range(0, len(words), batch_size):
+        indices = order[start:start + batch_size]
+        batch = [words[i] for i in indices]
+        sizes = lengths[indices]
+        codes = numpy.frombuffer("".join(batch).encode('utf-32-le'),
+                                 dtype=numpy.uint32)
+        columns = numpy.where(codes < len(lookup),
+                              lookup[numpy.minimum(codes, len(lookup) - 1)],
+                              unknown)
+        longest = int(sizes[-1]) if len(sizes) else 0
+        matrix = numpy.full((len(batch), longest), padding,
+                            dtype=lookup.dtype)
+        matrix[numpy.arange(longest) < sizes[:, None]] = columns
+
+        states = numpy.full(len(batch), automaton.init_state,
+                            dtype=numpy.int32)
+        for j in range(longest):
+            states = table[states, matrix[:, j]]
+        accepted[indices] = finals[states]
+
+    return accepted
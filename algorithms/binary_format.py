@@ -0,0 +1,415 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""binary_format.py
+
+Compact binary container for automata and grammars, the counterpart of the
+JSON files of io_manager. Every string (state names, symbols, productions) is
+stored once in a string table and referred to by its index, the transitions
+are kept as compressed sparse rows and the accept states as a bitmap. When
+the automaton is deterministic, its dense transition table is stored as well,
+so load_compiled can map the file into memory and match words straight from
+it, without building a Python object per state.
+
+All numbers are little-endian and every array starts at a multiple of eight
+bytes. The header holds the kind of object and nine counts: the number of
+strings, the bytes they take, and the sizes of the sections of the object.
+After it come, in order:
+  * the string table: len + 1 offsets (uint32) and the UTF-8 blob;
+  * for automata: the alphabet, then the names of the states (row offsets
+    and string indices), the transitions (row offsets, letter codes and
+    destination states, the code len(alphabet) being epsilon), the start
+    states, the accept states' bitmap, the tags of the states if any are
+    tagged (the string index of the kind of each state, NO_TAG for none,
+    and the priority of each one, int32) and, if the automaton is
+    deterministic, the dense table (int32, one row per state, DEAD for no
+    transition);
+  * for grammars: the non-terminals, the terminals, the head of each
+    production rule and its bodies (row offsets and string indices).
+
+Gustavo Zambonin & Matheus Ben-Hur de Melo Leite, UFSC, November 2015.
+"""
+
+import mmap
+import struct
+import sys
+from array import array
+from algorithms.compiled_automaton import CompiledAutomaton, DEAD
+from algorithms.finite_automaton import FiniteAutomaton
+from algorithms.regular_grammar import RegularGrammar
+
+MAGIC, VERSION = b'RLBIN', 2
+AUTOMATON, GRAMMAR = 0, 1
+HEADER = struct.Struct('<5sHB9I')
+NO_TAG = 0xFFFFFFFF
+
+
+class Strings(object):
+    """The string table of a container, decoded on demand."""
+
+    __slots__ = ('offsets', 'blob')
+
+    def __init__(self, offsets, blob):
+        """Inits Strings with the offsets of each string in the blob."""
+        self.offsets, self.blob = offsets, blob
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return bytes(self.blob[start:end]).decode('utf8')
+
+
+class Names(object):
+    """The names of the states of a container, each one a frozenset of
+    strings, decoded on demand.
+    """
+
+    __slots__ = ('strings', 'offsets', 'atoms')
+
+    def __init__(self, strings, offsets, atoms):
+        """Inits Names with the rows of string indices of each state."""
+        self.strings, self.offsets, self.atoms = strings, offsets, atoms
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, state):
+        start, end = self.offsets[state], self.offsets[state + 1]
+        return frozenset(self.strings[atom]
+                         for atom in self.atoms[start:end])
+
+    def __iter__(self):
+        for state in range(len(self)):
+            yield self[state]
+
+
+class Tags(object):
+    """The kind of word recognized by each state of a container, or None,
+    decoded on demand.
+    """
+
+    __slots__ = ('strings', 'codes')
+
+    def __init__(self, strings, codes):
+        """Inits Tags with the string index of each state's tag."""
+        self.strings, self.codes = strings, codes
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, state):
+        code = self.codes[state]
+        return self.strings[code] if code != NO_TAG else None
+
+
+class Writer(object):
+    """Assembles a container, interning strings as they are used.
+
+    Attributes:
+        index: the position of each string in the string table.
+        chunks: the arrays written so far, after the string table.
+    """
+
+    def __init__(self):
+        """Inits Writer with the attributes introduced above."""
+        self.index, self.chunks = {}, []
+
+    def intern(self, text):
+        """Returns the index of a string, adding it to the table if needed."""
+        if text not in self.index:
+            self.index[text] = len(self.index)
+        return self.index[text]
+
+    def put(self, data, code=None):
+        """Appends an array of integers, of the given type code, or raw
+        bytes, padded to a multiple of eight bytes.
+        """
+        if code is not None:
+            data = array(code, data)
+            if sys.byteorder == 'big':
+                data.byteswap()
+            data = data.tobytes()
+        self.chunks += [data, bytes(-len(data) % 8)]
+
+    def rows(self, rows, code='I'):
+        """Appends lists of integers as compressed sparse rows: the offset
+        of each row, followed by every row's items.
+        """
+        offsets, items = [0], []
+        for row in rows:
+            items += row
+            offsets.append(len(items))
+        self.put(offsets, 'I')
+        self.put(items, code)
+        return len(items)
+
+    def finish(self, kind, *counts):
+        """Returns the whole container, given its kind and the seven counts
+        of its sections, which are preceded by the string table.
+        """
+        blobs = [text.encode('utf8') for text in self.index]
+        offsets = [0]
+        for blob in blobs:
+            offsets.append(offsets[-1] + len(blob))
+        body, self.chunks = self.chunks, []
+        self.put(HEADER.pack(MAGIC, VERSION, kind, len(blobs),
+                             offsets[-1], *counts))
+        self.put(offsets, 'I')
+        self.put(b''.join(blobs))
+        return b''.join(self.chunks + body)
+
+
+def automaton_to_bytes(aut):
+    """Serializes a finite automaton, in any of its forms, as a container.
+
+    Returns:
+        The serialized automaton.
+    """
+    writer = Writer()
+    keys, moves, resolve = aut.indexed_transitions()
+    letters = sorted({letter for letter in aut.alphabet} |
+                     {letter for move in moves for letter in move} -
+                     {aut.epsilon})
+    codes = {letter: code for code, letter in enumerate(letters)}
+    codes[aut.epsilon] = len(letters)
+
+    def numbers(state):
+        return resolve([state] if isinstance(state, str) else state)
+
+    rows, deterministic = [], True
+    for move in moves:
+        row = sorted((codes[letter], dest) for letter, dests in move.items()
+                     for dest in dests)
+        deterministic &= all(code < len(letters) for code, _ in row) and \
+            len({code for code, _ in row}) == len(row)
+        rows.append(row)
+    init = sorted(set(numbers(aut.init_state))) if aut.init_state else []
+    deterministic &= len(init) == 1
+    finals = bytearray((len(keys) + 7) // 8)
+    for final in aut.final_states:
+        for state in numbers(final):
+            finals[state >> 3] |= 1 << (state & 7)
+    tags = {}
+    for state, tag in aut.tags.items():
+        for i in numbers(state):
+            tags[i] = min(tag, tags.get(i, tag))
+
+    writer.put([writer.intern(letter) for letter in letters], 'I')
+    atoms = writer.rows([sorted(writer.intern(atom) for atom in key)
+                         for key in keys])
+    writer.rows([[code for code, _ in row] for row in rows])
+    writer.put([dest for row in rows for _, dest in row], 'I')
+    writer.put(init, 'I')
+    writer.put(bytes(finals))
+    if tags:
+        writer.put([writer.intern(tags[state][1]) if state in tags
+                    else NO_TAG for state in range(len(keys))], 'I')
+        writer.put([tags[state][0] if state in tags else 0
+                    for state in range(len(keys))], 'i')
+    if deterministic:
+        table = [DEAD] * (len(keys) * len(letters))
+        for state, row in enumerate(rows):
+            for code, dest in row:
+                table[state * len(letters) + code] = dest
+        writer.put(table, 'i')
+    return writer.finish(AUTOMATON, len(keys), atoms, len(letters),
+                         sum(map(len, rows)), len(init), deterministic,
+                         bool(tags))
+
+
+def grammar_to_bytes(grm):
+    """Serializes a regular grammar as a container.
+
+    Returns:
+        The serialized grammar.
+    """
+    writer = Writer()
+    heads = list(grm.productions)
+    writer.put([writer.intern(symbol) for symbol in grm.non_terminals], 'I')
+    writer.put([writer.intern(symbol) for symbol in grm.terminals], 'I')
+    writer.put([writer.intern(head) for head in heads], 'I')
+    bodies = writer.rows([[writer.intern(body) for body in
+                           grm.productions[head]] for head in heads])
+    init = writer.intern(grm.init_production)
+    return writer.finish(GRAMMAR, len(grm.non_terminals), len(grm.terminals),
+                         len(heads), bodies, init, 0, 0)
+
+
+def write_container(path, obj):
+    """Writes a FiniteAutomaton or a RegularGrammar as a container file."""
+    if isinstance(obj, FiniteAutomaton):
+        data = automaton_to_bytes(obj)
+    else:
+        data = grammar_to_bytes(obj)
+    with open(path, 'wb') as file_out:
+        file_out.write(data)
+
+
+def is_container(path):
+    """Checks whether a file starts as a container."""
+    with open(path, 'rb') as file_in:
+        return file_in.read(len(MAGIC)) == MAGIC
+
+
+class Reader(object):
+    """Walks the sections of a container, in the order they were written.
+    On little-endian machines the arrays are views of the data, so nothing
+    is copied.
+
+    Attributes:
+        data: a memoryview of the container.
+        kind: AUTOMATON or GRAMMAR.
+        counts: the nine counts of the header.
+        offset: where the next section starts.
+    """
+
+    def __init__(self, data):
+        """Inits Reader past the header of the container.
+
+        Raises:
+            ValueError: if the data is not in the expected format or version.
+        """
+        self.data = memoryview(data)
+        try:
+            header = HEADER.unpack_from(self.data)
+        except struct.error:
+            raise ValueError("truncated container")
+        magic, version, self.kind = header[:3]
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("unknown container format")
+        self.counts = header[3:]
+        self.offset = HEADER.size + (-HEADER.size % 8)
+
+    def take(self, count, code=None):
+        """Returns the next section: count integers of the given type code,
+        or count raw bytes.
+
+        Raises:
+            ValueError: if the container ends before it.
+        """
+        size = count * (array(code).itemsize if code else 1)
+        if self.offset + size > len(self.data):
+            raise ValueError("truncated container")
+        chunk = self.data[self.offset:self.offset + size]
+        self.offset += size + (-size % 8)
+        if code is None:
+            return chunk
+        if sys.byteorder == 'big':
+            chunk = array(code, chunk.tobytes())
+            chunk.byteswap()
+            return chunk
+        return chunk.cast(code)
+
+    def strings(self):
+        """Returns the string table."""
+        offsets = self.take(self.counts[0] + 1, 'I')
+        return Strings(offsets, self.take(self.counts[1]))
+
+    def rows(self, count, code='I'):
+        """Returns the offsets and the items of count compressed rows."""
+        offsets = self.take(count + 1, 'I')
+        return offsets, self.take(offsets[-1], code)
+
+
+def read_automaton(reader):
+    """Reads the sections of an automaton.
+
+    Returns:
+        A tuple (strings, alphabet, names, offsets, letters, dests, init,
+        finals, tags, priorities, table), tags and priorities being None
+        when no state is tagged, and table for nondeterministic automata.
+    """
+    _, _, size, _, width, entries, starts, dense, tagged = reader.counts
+    strings = reader.strings()
+    alphabet = [strings[i] for i in reader.take(width, 'I')]
+    names = Names(strings, *reader.rows(size))
+    offsets, letters = reader.rows(size)
+    dests = reader.take(entries, 'I')
+    init = reader.take(starts, 'I')
+    finals = reader.take((size + 7) // 8)
+    tags = priorities = None
+    if tagged:
+        tags = Tags(strings, reader.take(size, 'I'))
+        priorities = reader.take(size, 'i')
+    table = reader.take(size * width, 'i') if dense else None
+    return (strings, alphabet, names, offsets, letters, dests, init, finals,
+            tags, priorities, table)
+
+
+def read_container(path):
+    """Reads a container file into the object it holds.
+
+    Returns:
+        A FiniteAutomaton, in the form io_manager.load gives, or a
+        RegularGrammar.
+
+    Raises:
+        ValueError: if the file is not a valid container.
+    """
+    with open(path, 'rb') as file_in:
+        reader = Reader(file_in.read())
+    if reader.kind == GRAMMAR:
+        strings = reader.strings()
+        counts = reader.counts
+        non_terminals = {strings[i] for i in reader.take(counts[2], 'I')}
+        terminals = {strings[i] for i in reader.take(counts[3], 'I')}
+        heads = [strings[i] for i in reader.take(counts[4], 'I')]
+        offsets, bodies = reader.rows(counts[4])
+        productions = {head: {strings[i] for i in
+                              bodies[offsets[n]:offsets[n + 1]]}
+                       for n, head in enumerate(heads)}
+        return RegularGrammar(non_terminals, terminals, productions,
+                              strings[counts[6]])
+
+    strings, alphabet, names, offsets, letters, dests, init, finals, tags, \
+        priorities, _ = read_automaton(reader)
+    names = list(names)
+    symbols = alphabet + ["ε"]
+    transitions = {}
+    for state, name in enumerate(names):
+        row = {letter: set() for letter in alphabet}
+        for entry in range(offsets[state], offsets[state + 1]):
+            row.setdefault(symbols[letters[entry]], set()).update(
+                names[dests[entry]])
+        transitions[name] = row
+    single = all(len(name) == 1 for name in names)
+    states = {next(iter(name)) for name in names} if single else set(names)
+    init_state = sorted(set().union(*(names[state] for state in init)))
+    if len(init_state) == 1:
+        init_state = init_state[0]
+    final_states = {name for state, name in enumerate(names)
+                    if finals[state >> 3] >> (state & 7) & 1}
+    tagged = {}
+    if tags is not None:
+        tagged = {name: (priorities[state], tags[state])
+                  for state, name in enumerate(names)
+                  if tags[state] is not None}
+    return FiniteAutomaton(states, set(alphabet), transitions, init_state,
+                           final_states, tagged)
+
+
+def load_compiled(path):
+    """Maps a container file into memory as a compiled automaton. Its table,
+    accept states, state names and tags are read from the mapping when they
+    are used, so loading takes the same time whatever the number of states.
+
+    Returns:
+        The CompiledAutomaton held by the file.
+
+    Raises:
+        ValueError: if the file is not a valid container, or holds a grammar
+            or a nondeterministic automaton.
+    """
+    with open(path, 'rb') as file_in:
+        data = mmap.mmap(file_in.fileno(), 0, access=mmap.ACCESS_READ)
+    reader = Reader(data)
+    if reader.kind != AUTOMATON:
+        raise ValueError("the container does not hold an automaton")
+    _, alphabet, names, _, _, _, init, finals, tags, priorities, table = \
+        read_automaton(reader)
+    if table is None:
+        raise ValueError("the automaton is not deterministic")
+    return CompiledAutomaton(names, alphabet, table, init[0], finals, tags,
+                             priorities=priorities)
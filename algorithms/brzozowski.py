@@ -0,0 +1,242 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""brzozowski.py
+
+Direct construction of deterministic finite automata from regular expressions
+through Brzozowski's derivatives. The derivative of an expression by a symbol
+denotes what is left of its words after reading that symbol, so the
+expressions reached from the original one are the states of the automaton.
+
+Gustavo Zambonin & Matheus Ben-Hur de Melo Leite, UFSC, November 2015.
+"""
+
+from algorithms.finite_automaton import FiniteAutomaton
+from algorithms.regex_ast import Class, Concat, Epsilon, Star, Symbol, \
+    Union, leaf_letters, partition
+
+EMPTY, EPSILON, SYMBOL, CONCAT, UNION, STAR = range(6)
+
+
+class Term(object):
+    """A regular expression in normal form. Terms are hash-consed: equal
+    terms are the very same object, so they are compared by identity.
+
+    Attributes:
+        kind: one of EMPTY (∅), EPSILON, SYMBOL, CONCAT, UNION and STAR.
+        parts: the subterms; a concatenation always has two, the first of
+            them never being a concatenation itself, and the parts of a union
+            are sorted by number, without repetitions.
+        letters: the frozenset of letters matched by a SYMBOL term, None
+            otherwise.
+        nullable: whether the term accepts the empty word.
+        number: the order in which the term was created.
+    """
+
+    __slots__ = ('kind', 'parts', 'letters', 'nullable', 'number')
+
+    def __init__(self, kind, parts, letters, nullable, number):
+        """Inits Term with the attributes introduced above."""
+        self.kind = kind
+        self.parts = parts
+        self.letters = letters
+        self.nullable = nullable
+        self.number = number
+
+
+class Derivatives(object):
+    """Builds terms through smart constructors, which simplify them as they
+    are created (∅ and ε are dropped where they change nothing, unions are
+    flattened, sorted and deduplicated, concatenations associate to the
+    right and stars of stars collapse), and memoizes every derivative taken.
+    Since only finitely many normal forms are reachable by derivatives, the
+    construction always ends.
+
+    Attributes:
+        terms: the table of every term created, keyed by its structure.
+        derivatives: the memoized derivatives, keyed by (term, symbol).
+    """
+
+    def __init__(self):
+        """Inits Derivatives with the attributes introduced above."""
+        self.terms, self.derivatives = {}, {}
+        self.empty = self.term(EMPTY, (), None, False)
+        self.epsilon = self.term(EPSILON, (), None, True)
+
+    def term(self, kind, parts, letters, nullable):
+        """Returns the unique term with the given structure."""
+        key = (kind, tuple(part.number for part in parts), letters)
+        found = self.terms.get(key)
+        if found is None:
+            found = self.terms[key] = Term(kind, tuple(parts), letters,
+                                           nullable, len(self.terms))
+        return found
+
+    def symbol(self, letters):
+        """Builds the term that accepts only the given letters, each of them
+        as a word of a single letter.
+        """
+        return self.term(SYMBOL, (), frozenset(letters), False)
+
+    def concat(self, first, second):
+        """Builds the concatenation of two terms."""
+        if first is self.empty or second is self.empty:
+            return self.empty
+        factors = []
+        while first.kind == CONCAT:
+            factors.append(first.parts[0])
+            first = first.parts[1]
+        factors.append(first)
+        result = second
+        for factor in reversed(factors):
+            if factor is self.epsilon:
+                continue
+            if result is self.epsilon:
+                result = factor
+            else:
+                result = self.term(CONCAT, (factor, result), None,
+                                   factor.nullable and result.nullable)
+        return result
+
+    def union(self, parts):
+        """Builds the union of a list of terms."""
+        flat = {}
+        for part in parts:
+            for term in part.parts if part.kind == UNION else (part,):
+                if term is not self.empty:
+                    flat[term.number] = term
+        if not flat:
+            return self.empty
+        if len(flat) == 1:
+            return next(iter(flat.values()))
+        ordered = [flat[number] for number in sorted(flat)]
+        return self.term(UNION, ordered, None,
+                         any(term.nullable for term in ordered))
+
+    def star(self, part):
+        """Builds the Kleene closure of a term."""
+        if part is self.empty or part is self.epsilon:
+            return self.epsilon
+        if part.kind == STAR:
+            return part
+        return self.term(STAR, (part,), None, True)
+
+    def from_tree(self, tree, atoms):
+        """Converts a syntax tree, as given by regex_ast.parse, to a term,
+        given the letters of its symbols, as given by regex_ast.partition.
+        """
+        done, stack = [], [(tree, False)]
+        while stack:
+            node, visited = stack.pop()
+            if isinstance(node, (Symbol, Class)):
+                done.append(self.symbol(leaf_letters(node, atoms)))
+            elif isinstance(node, Epsilon):
+                done.append(self.epsilon)
+            elif not visited:
+                stack.append((node, True))
+                children = (node.part,) if isinstance(node, Star) else \
+                    node.parts
+                stack.extend((child, False) for child in reversed(children))
+            elif isinstance(node, Star):
+                done.append(self.star(done.pop()))
+            else:
+                parts = done[len(done) - len(node.parts):]
+                del done[len(done) - len(node.parts):]
+                if isinstance(node, Union):
+                    done.append(self.union(parts))
+                else:
+                    result = parts[-1]
+                    for part in reversed(parts[:-1]):
+                        result = self.concat(part, result)
+                    done.append(result)
+        return done.pop()
+
+    def derive(self, term, letter):
+        """Computes the derivative of a term by a symbol. The subterms whose
+        derivatives are needed are handled first, through an explicit stack,
+        so deep terms do not exhaust the recursion limit.
+        """
+        memo = self.derivatives
+        stack = [term]
+        while stack:
+            top = stack[-1]
+            if (top, letter) in memo:
+                stack.pop()
+                continue
+            if top.kind == CONCAT:
+                needed = top.parts if top.parts[0].nullable else \
+                    top.parts[:1]
+            elif top.kind in (UNION, STAR):
+                needed = top.parts
+            else:
+                needed = ()
+            missing = [part for part in needed if (part, letter) not in memo]
+            if missing:
+                stack.extend(missing)
+                continue
+            stack.pop()
+
+            if top.kind == SYMBOL:
+                result = self.epsilon if letter in top.letters else self.empty
+            elif top.kind == CONCAT:
+                first, second = top.parts
+                result = self.concat(memo[first, letter], second)
+                if first.nullable:
+                    result = self.union([result, memo[second, letter]])
+            elif top.kind == UNION:
+                result = self.union([memo[part, letter]
+                                     for part in top.parts])
+            elif top.kind == STAR:
+                result = self.concat(memo[top.parts[0], letter], top)
+            else:
+                result = self.empty
+            memo[top, letter] = result
+        return memo[term, letter]
+
+    def to_automaton(self, tree, atoms=None):
+        """Builds the deterministic automaton of a regular expression, each
+        state being a term reached from the expression by derivatives. The
+        term ∅ is the dead state, which is left out.
+
+        Arguments:
+            tree: the root of a syntax tree, as given by regex_ast.parse.
+            atoms: the letters of the symbols, as given by
+                regex_ast.partition, which must have seen the tree. By
+                default, the atoms of the tree alone are used.
+
+        Returns:
+            A FiniteAutomaton, already deterministic, whose states are named
+            q0, q1, ... in the order they are found.
+        """
+        if atoms is None:
+            atoms = partition([tree])
+        alphabet, stack = set(), [tree]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, (Symbol, Class)):
+                alphabet.update(leaf_letters(node, atoms))
+            elif isinstance(node, Star):
+                stack.append(node.part)
+            elif isinstance(node, (Concat, Union)):
+                stack.extend(node.parts)
+        letters = sorted(alphabet)
+
+        start = self.from_tree(tree, atoms)
+        names, order = {start: 'q0'}, [start]
+        transitions = {}
+        for state in order:
+            row = {}
+            for letter in letters:
+                dest = self.derive(state, letter)
+                if dest is self.empty:
+                    row[letter] = set()
+                    continue
+                if dest not in names:
+                    names[dest] = 'q%d' % len(order)
+                    order.append(dest)
+                row[letter] = {names[dest]}
+            transitions[frozenset([names[state]])] = row
+
+        return FiniteAutomaton(
+            set(names.values()), alphabet, transitions, 'q0',
+            {frozenset([names[state]]) for state in order if state.nullable})
@@ -0,0 +1,398 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""compiled_automaton.py
+
+Compact and immutable representation of a deterministic finite automaton. The
+states are numbered from 0 to n-1, the alphabet is mapped to column indices
+and the transition function is kept in a flat integer table, so a scan costs
+a single lookup per character instead of building a new state object.
+
+Gustavo Zambonin & Matheus Ben-Hur de Melo Leite, UFSC, November 2015.
+"""
+
+import struct
+import sys
+from array import array
+from algorithms.finite_automaton import FiniteAutomaton
+from algorithms.regex_ast import class_label, is_class_label, letter_chars
+
+DEAD = -1
+MAGIC, VERSION = b'RLDFA', 4
+HEADER = struct.Struct('<5sHiiii')
+
+
+class CompiledAutomaton(object):
+    """A deterministic finite automaton whose transition function δ is stored
+    as a table with one row per state and one column per symbol. Missing
+    transitions point to the DEAD sentinel, which is never an accept state.
+
+    Attributes:
+        names: the original transition key (a frozenset) of each state,
+            indexed by its number, in a tuple or any other sequence (such as
+            the lazy one of binary_format.load_compiled).
+        alphabet: the letters of the automaton, indexed by their column.
+        columns: a mapping from each letter to its column, and from each
+            symbol stood for by a class label (such as [a-z]) to the column
+            of the label.
+        table: a flat array('i') where the transition of state s through the
+            symbol at column c is found at s * len(alphabet) + c.
+        init_state: the number of the start state, or DEAD when the
+            automaton has no states.
+        finals: a bitmap in which bit s is set if state s is an accept state.
+        tags: the kind of word recognized by each state, or None, in a
+            tuple or any other sequence.
+        priorities: the priority of the tag of each state, as in
+            FiniteAutomaton.tags, or 0 for the states without a tag.
+        full_width: the number of columns before compress_columns merged
+            the equivalent ones, or the current number if it never did.
+    """
+
+    __slots__ = ('names', 'alphabet', 'columns', 'width', 'table',
+                 'init_state', 'finals', 'tags', 'priorities', 'full_width')
+
+    def __init__(self, names, alphabet, table, init_state, finals,
+                 tags=None, full_width=None, priorities=None):
+        """Inits CompiledAutomaton with the attributes introduced above."""
+        self.names = tuple(names) if isinstance(names, list) else names
+        self.alphabet = tuple(alphabet)
+        self.columns = {}
+        for i, letter in enumerate(self.alphabet):
+            if is_class_label(letter):
+                for char in letter_chars(letter):
+                    self.columns.setdefault(char, i)
+        for i, letter in enumerate(self.alphabet):
+            self.columns[letter] = i
+        self.width = len(self.alphabet)
+        self.table = table
+        self.init_state = init_state
+        self.finals = bytes(finals)
+        self.tags = tuple(tags) if isinstance(tags, list) else tags
+        if tags is None:
+            self.tags = (None,) * len(self.names)
+        self.priorities = tuple(priorities) \
+            if isinstance(priorities, list) else priorities
+        if priorities is None:
+            self.priorities = (0,) * len(self.names)
+        self.full_width = full_width if full_width is not None else \
+            self.width
+
+    def __len__(self):
+        """Returns the number of states of the automaton."""
+        return len(self.names)
+
+    def __str__(self):
+        """Pretty-prints the compiled automaton as its transition table."""
+        lines = ["\t" + "\t".join(self.alphabet)]
+        for state in range(len(self.names)):
+            row = self.table[state * self.width:(state + 1) * self.width]
+            prefix = "->" if state == self.init_state else ""
+            prefix += "*" if self.is_final(state) else ""
+            lines.append("%s%d\t%s" % (prefix, state, "\t".join(
+                "-" if dest == DEAD else str(dest) for dest in row)))
+        return "\n".join(lines)
+
+    def stats(self):
+        """Measures the transition table, whose cells take four bytes.
+
+        Returns:
+            A dictionary with the number of states, the number of columns
+            before and after compress_columns, the size of the table and the
+            bytes saved by the compression.
+        """
+        size = len(self.names)
+        return {'states': size, 'columns': self.width,
+                'columns_before': self.full_width,
+                'table_bytes': 4 * size * self.width,
+                'bytes_saved': 4 * size * (self.full_width - self.width)}
+
+    def is_final(self, state):
+        """Checks whether the given state number is an accept state."""
+        return state != DEAD and bool(self.finals[state >> 3] >>
+                                      (state & 7) & 1)
+
+    def tag(self, state):
+        """Returns the kind of word recognized by the given state, if any."""
+        return self.tags[state] if state != DEAD else None
+
+    def step(self, state, symbol):
+        """Computes a single transition.
+
+        Arguments:
+            state: the number of the current state (possibly DEAD).
+            symbol: the symbol read from the input.
+
+        Returns:
+            The number of the next state, or DEAD if there is none.
+        """
+        column = self.columns.get(symbol)
+        if state == DEAD or column is None:
+            return DEAD
+        return self.table[state * self.width + column]
+
+    def run(self, word, state=None):
+        """Feeds a whole word to the automaton.
+
+        Arguments:
+            word: an iterable of symbols.
+            state: where the computation starts, the start state by default.
+
+        Returns:
+            The number of the state reached, or DEAD.
+        """
+        table, columns, width = self.table, self.columns, self.width
+        if state is None:
+            state = self.init_state
+        for symbol in word:
+            column = columns.get(symbol)
+            if state == DEAD or column is None:
+                return DEAD
+            state = table[state * width + column]
+        return state
+
+    def accepts(self, word):
+        """Checks whether the word belongs to the language of the automaton."""
+        return self.is_final(self.run(word))
+
+    def to_bytes(self):
+        """Serializes the compiled automaton in a versioned binary format: a
+        header with the number of states, of columns (now and before any
+        compression) and the start state,
+        followed by the length-prefixed UTF-8 symbols and state names, the
+        little-endian transition table, the accept states' bitmap, the
+        tag of each state (an empty string for none) and the priorities of
+        the tags.
+
+        Returns:
+            The serialized automaton.
+        """
+        def pack(text):
+            data = text.encode('utf8')
+            return struct.pack('<I', len(data)) + data
+
+        parts = [HEADER.pack(MAGIC, VERSION, len(self.names), self.width,
+                             self.full_width, self.init_state)]
+        parts += [pack(symbol) for symbol in self.alphabet]
+        for name in self.names:
+            parts.append(struct.pack('<I', len(name)))
+            parts += [pack(atom) for atom in sorted(name)]
+        table = array('i', self.table)
+        if sys.byteorder == 'big':
+            table.byteswap()
+        parts += [table.tobytes(), self.finals]
+        parts += [pack(tag or '') for tag in self.tags]
+        priorities = array('i', self.priorities)
+        if sys.byteorder == 'big':
+            priorities.byteswap()
+        parts.append(priorities.tobytes())
+        return b''.join(parts)
+
+    def to_automaton(self):
+        """Converts the compiled form back to a FiniteAutomaton, following the
+        conventions of a determinized one: states are frozensets and every
+        state has a (possibly empty) transition through each symbol.
+
+        Returns:
+            An equivalent FiniteAutomaton, with the original state names.
+        """
+        names = self.names
+        transitions = {}
+        for state, name in enumerate(names):
+            row = state * self.width
+            transitions[name] = {
+                symbol: set(names[self.table[row + column]])
+                if self.table[row + column] != DEAD else set()
+                for column, symbol in enumerate(self.alphabet)}
+        init_state = set(names[self.init_state]) \
+            if self.init_state != DEAD else set()
+        final_states = {name for state, name in enumerate(names)
+                        if self.is_final(state)}
+        tags = {name: (priority, tag) for name, tag, priority
+                in zip(names, self.tags, self.priorities) if tag is not None}
+        return FiniteAutomaton(set(names), set(self.alphabet), transitions,
+                               init_state, final_states, tags)
+
+
+def state_key(state):
+    """Normalizes the many ways a state is written inside a FiniteAutomaton
+    (a plain name, a set of names or a frozenset) into its transition key.
+    """
+    if isinstance(state, str):
+        return frozenset([state])
+    return frozenset(state)
+
+
+def compile_automaton(aut):
+    """Numbers the reachable states of a determinized automaton,
+    breadth-first from its start state, and fills the transition table.
+
+    Arguments:
+        aut: a deterministic FiniteAutomaton.
+
+    Returns:
+        The equivalent CompiledAutomaton.
+
+    Raises:
+        ValueError: if the automaton has epsilon-moves or a nondeterministic
+            transition.
+    """
+    alphabet = sorted(letter for letter in aut.alphabet
+                      if letter != aut.epsilon)
+    index, names = {}, []
+    table = array('i')
+
+    def number(key):
+        if key not in index:
+            index[key] = len(names)
+            names.append(key)
+        return index[key]
+
+    def target(dest):
+        if isinstance(dest, str):
+            dest = [dest]
+        key = frozenset(dest)
+        if not key:
+            return DEAD
+        if key not in aut.transitions and len(key) > 1:
+            raise ValueError("automaton is not deterministic")
+        return number(key)
+
+    init_state = DEAD
+    if aut.init_state:
+        init_state = number(state_key(aut.init_state))
+
+    current = 0
+    while current < len(names):
+        moves = aut.transitions.get(names[current], {})
+        if moves.get(aut.epsilon):
+            raise ValueError("automaton has epsilon-moves")
+        table.extend(target(moves.get(letter, ())) for letter in alphabet)
+        current += 1
+
+    finals = bytearray((len(names) + 7) // 8)
+    for final in aut.final_states:
+        key = state_key(final)
+        if key in index:
+            finals[index[key] >> 3] |= 1 << (index[key] & 7)
+
+    tags = [aut.tags[key][1] if key in aut.tags else None for key in names]
+    priorities = [aut.tags[key][0] if key in aut.tags else 0
+                  for key in names]
+    return CompiledAutomaton(names, alphabet, table, init_state, finals, tags,
+                             priorities=priorities)
+
+
+def compress_columns(automaton):
+    """Merges the columns of a compiled automaton that no state tells
+    apart, that is, whose transitions agree in every row. The symbols of a
+    merged column become a single class label, so the columns of the result
+    still work as its symbol lookup table, and the narrowed table keeps one
+    column per equivalence class. Letters that are neither symbols nor class
+    labels, such as the multi-character ones of some automata files, are
+    never merged.
+
+    Arguments:
+        automaton: a CompiledAutomaton.
+
+    Returns:
+        The equivalent CompiledAutomaton, or the automaton itself if none of
+        its columns can be merged.
+    """
+    size, width, table = len(automaton), automaton.width, automaton.table
+    classes, order = {}, []
+    for column, letter in enumerate(automaton.alphabet):
+        key = tuple(table[state * width + column] for state in range(size))
+        if len(letter) > 1 and not is_class_label(letter):
+            key += (letter,)
+        if key not in classes:
+            classes[key] = []
+            order.append(key)
+        classes[key].append(column)
+    if len(order) == width:
+        return automaton
+
+    alphabet, kept = [], []
+    for key in order:
+        letters = [automaton.alphabet[column] for column in classes[key]]
+        if len(letters) == 1:
+            alphabet.append(letters[0])
+        else:
+            alphabet.append(class_label(set().union(
+                *(letter_chars(letter) for letter in letters))))
+        kept.append(classes[key][0])
+    narrow = array('i', (table[state * width + column]
+                         for state in range(size) for column in kept))
+    return CompiledAutomaton(automaton.names, alphabet, narrow,
+                             automaton.init_state, automaton.finals,
+                             automaton.tags, automaton.full_width,
+                             automaton.priorities)
+
+
+def from_bytes(data):
+    """Rebuilds a compiled automaton serialized by its to_bytes method.
+
+    Arguments:
+        data: the bytes holding the serialized automaton.
+
+    Returns:
+        The equivalent CompiledAutomaton.
+
+    Raises:
+        ValueError: if the data is not in the expected format or version.
+    """
+    try:
+        magic, version, size, width, full_width, init_state = \
+            HEADER.unpack_from(data)
+    except struct.error:
+        raise ValueError("truncated compiled automaton")
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("unknown compiled automaton format")
+    offset = HEADER.size
+
+    def unpack(offset):
+        length, = struct.unpack_from('<I', data, offset)
+        offset += 4
+        return bytes(data[offset:offset + length]).decode('utf8'), \
+            offset + length
+
+    try:
+        alphabet = []
+        for _ in range(width):
+            symbol, offset = unpack(offset)
+            alphabet.append(symbol)
+        names = []
+        for _ in range(size):
+            count, = struct.unpack_from('<I', data, offset)
+            offset += 4
+            name = []
+            for _ in range(count):
+                atom, offset = unpack(offset)
+                name.append(atom)
+            names.append(frozenset(name))
+    except struct.error:
+        raise ValueError("truncated compiled automaton")
+
+    end = offset + 4 * size * width
+    table = array('i')
+    table.frombytes(data[offset:end])
+    if sys.byteorder == 'big':
+        table.byteswap()
+    finals = data[end:end + (size + 7) // 8]
+    if len(table) != size * width or len(finals) != (size + 7) // 8:
+        raise ValueError("truncated compiled automaton")
+    offset = end + len(finals)
+    tags = []
+    try:
+        for _ in range(size):
+            tag, offset = unpack(offset)
+            tags.append(tag or None)
+    except struct.error:
+        raise ValueError("truncated compiled automaton")
+    priorities = array('i')
+    priorities.frombytes(data[offset:offset + 4 * size])
+    if sys.byteorder == 'big':
+        priorities.byteswap()
+    if len(priorities) != size:
+        raise ValueError("truncated compiled automaton")
+    return CompiledAutomaton(names, alphabet, table, init_state, finals, tags,
+                             full_width, list(priorities))
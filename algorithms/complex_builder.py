@@ -1,155 +1,139 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-import string
-from algorithms.regular_expression import RegularExpression
+import threading
+from copy import copy
+from algorithms.compiled_automaton import VERSION, compile_automaton, \
+    compress_columns, from_bytes
+from algorithms.disk_cache import cache_key, read_entry, source_digest, \
+    write_entry
+from algorithms.regex_ast import parse, partition
+from algorithms.thompson import Thompson
 
 
 class Builder(object):
     """Responsible for outputting the automaton that recognizes the proposed
-    lexical structure. Reserved words and other simple automata (such as [0-9]
-    or [a-zA-Z]) can be computed through regular expressions implicitly, only
-    to be united later with the or, concatenation and Kleene star operations.
+    lexical structure. Every kind of word is declared as a regular expression,
+    with character classes (such as [0-9] or [a-zA-Z]) for the sets of
+    symbols. All expressions share a single partition of the symbols in
+    atoms, so the letters of their automata never overlap, and they are
+    assembled into one automaton through Thompson's construction, united by
+    the or operation. The union is kept as it is (nfa_aut), and it is only
+    determinized and minimized by minimal_lexer, when the compiled lexer has
+    to be built. Each accept state is tagged with the kind of word it
+    recognizes, so that classifying a lexeme costs a single lookup.
     """
     # ########## Declaration of words ##########
 
-    words = 'else|if|while|read|write|list|bool|str|int|False|True'
-    ops = '=|->|:=|and|or|not|<|>|==|>=|<=|!=|+|-|×|/'
-    single_words = "{}|{}".format(words, ops)
-    letters = "({})".format("|".join(string.ascii_letters))
-    numbers = "|".join(string.digits)
-    nonzero = "|".join(string.digits)[2:]
+    keywords = 'else|if|while|read|write|list|bool|str|int'
+    booleans = 'False|True'
+    logic_ops = 'and|or|not'
+    arit_ops = '+|-|×|/'
+    comp_ops = '<|>|==|>=|<=|!='
+    attr_ops = '=|->|:='
+    delimiters = ';|\\(|\\)'
+    words = "{}|{}".format(keywords, booleans)
+    ops = "{}|{}|{}|{}".format(attr_ops, logic_ops, comp_ops, arit_ops)
+    letters = "[a-zA-Z]"
+    numbers = "[0-9]"
+    nonzero = "[1-9]"
     underscore, quote, zero = "_", "\"", "0"
-    string_char = "|".join(set(map(chr, range(32, 127))) - set("\\\"()|*"))
+    string_char = '[^"()*\\\\|]'
+    identifier = "{0}({0}|{1}|{2})*".format(letters, numbers, underscore)
+    integer = "{}{}*|{}".format(nonzero, numbers, zero)
+    string = "{0}{1}*{0}".format(quote, string_char)
+
+    # kinds of words, from the highest priority to the lowest
+    kinds = ['RSWD', 'BOOL', 'LGOP', 'AROP', 'CPOP', 'ATOP', 'DELM',
+             'IDNT', 'INTG', 'STRG']
+
+    def __init__(self):
+        """Inits Builder by constructing every automaton of the lexical
+        structure from the declarations above.
+        """
+        expressions = [self.keywords, self.booleans, self.logic_ops,
+                       self.arit_ops, self.comp_ops, self.attr_ops,
+                       self.delimiters, self.identifier, self.integer,
+                       self.string]
+        trees = [parse(expression) for expression in expressions]
+        atoms = partition(trees)
+
+        thompson = Thompson()
+        fragments = []
+        for priority, (kind, tree) in enumerate(zip(self.kinds, trees)):
+            fragment = thompson.expression(tree, atoms)
+            for state in fragment.accepts:
+                thompson.tags[state] = (priority, kind)
+            fragments.append(fragment)
+
+        self.nfa_aut = thompson.to_automaton(thompson.union(fragments))
+
+
+memo, memo_lock = {}, threading.RLock()
+
+# the modules whose code decides the compiled lexer
+BUILDER_MODULES = ['algorithms.complex_builder', 'algorithms.regex_ast',
+                   'algorithms.thompson', 'algorithms.finite_automaton',
+                   'algorithms.compiled_automaton']
+
+
+def memoized(name, factory):
+    """Runs factory only the first time name is requested in this process,
+    even among concurrent threads, and returns the same result afterwards.
+    """
+    try:
+        return memo[name]
+    except KeyError:
+        pass
+    with memo_lock:
+        if name not in memo:
+            memo[name] = factory()
+        return memo[name]
+
+
+def shared_builder():
+    """Returns the Builder of this process, constructed on first use."""
+    return memoized('builder', Builder)
+
 
-    # ########## Reserved words recognizer automaton ##########
-
-    reg_exp = RegularExpression(single_words)
-    aut = reg_exp.regexp_to_automaton()
-    aut_2 = reg_exp.rename_aut(aut)
-    aut_2.minimize()
-
-    finals_aut = list()
-    finals_aut.append(aut_2)
-
-    # ########## Identifier recognizer automaton ##########
-
-    list_regs = list()
-    list_regs.append(letters)
-    list_regs.append(numbers)
-    list_regs.append(letters)
-    list_regs.append(underscore)
-
-    list_auts = list()
+def minimal_lexer():
+    """Returns the union of the lexical structure determinized and
+    minimized, constructed on first use. The lazy mode runs over nfa_aut
+    instead, so it never pays for the subset construction.
+    """
+    def build():
+        automaton = copy(shared_builder().nfa_aut)
+        automaton.minimize()
+        return automaton
+    return memoized('minimal', build)
+
+
+def compiled_lexer():
+    """Returns the compiled automaton of the lexical structure, memoized for
+    the whole process. It is read from the disk cache whenever possible, the
+    entry being keyed by the declarations of Builder, the version of the
+    binary format and the source of the modules that construct it, so any
+    change on them triggers a new construction.
+    """
+    return memoized('lexer', load_lexer)
 
-    for reg in list_regs:
-        reg_exp = RegularExpression(reg)
-        aut = reg_exp.regexp_to_automaton()
-        aut.minimize()
-        list_auts.append(aut)
-    reg_aux = RegularExpression("")
-    automatons = list()
-
-    automatons.append(list_auts.pop(1))
-    automatons.append(list_auts.pop(1))
-    aut_aux = reg_aux.or_op(automatons)
-
-    automatons = list()
-    automatons.append(aut_aux)
-    automatons.append(list_auts.pop(1))
-    aut_aux = reg_aux.or_op(automatons)
-
-    automatons = list()
-    automatons.append(aut_aux)
-    aut_aux = reg_aux.closure_op(automatons)
-    list_auts.append(aut_aux)
-
-    automatons = list()
-    automatons.append(list_auts.pop(0))
-    automatons.append(list_auts.pop(0))
-    aut_aux = reg_aux.concat_op(automatons)
-    aux_aut2 = reg_aux.rename_aut(aut_aux)
-    aux_aut2.minimize()
-
-    finals_aut.append(aux_aut2)
-
-    # ########## Integer recognizer automaton ##########
-
-    list_regs = list()
-    list_regs.append(nonzero)
-    list_regs.append(numbers)
-    list_regs.append(zero)
-
-    list_auts = list()
-
-    for reg in list_regs:
-        reg_exp = RegularExpression(reg)
-        aut = reg_exp.regexp_to_automaton()
-        aut.minimize()
-        list_auts.append(aut)
-    reg_aux = RegularExpression("")
-
-    automatons = list()
-    automatons.append(list_auts.pop(1))
-    aux_aut = reg_aux.closure_op(automatons)
-    list_auts.insert(1, aux_aut)
-
-    automatons = list()
-    automatons.append(list_auts.pop(0))
-    automatons.append(list_auts.pop(0))
-    aux_aut = reg_aux.concat_op(automatons)
-    list_auts.insert(1, aux_aut)
-
-    aux_aut = reg_aux.or_op(list_auts)
-    aux_aut2 = reg_aux.rename_aut(aux_aut)
-    aux_aut2.minimize()
-
-    finals_aut.append(aux_aut2)
-
-    # ########## String recognizer automaton ##########
-
-    list_regs = list()
-    list_regs.append(quote)
-    list_regs.append(string_char)
-    list_regs.append(quote)
-
-    list_auts = list()
-
-    for reg in list_regs:
-        reg_exp = RegularExpression(reg)
-        aut = reg_exp.regexp_to_automaton()
-        aut.minimize()
-        list_auts.append(aut)
-    reg_aux = RegularExpression("")
-
-    automatons = list()
-    automatons.append(list_auts.pop(1))
-    aux_aut = reg_aux.closure_op(automatons)
-    list_auts.insert(1, aux_aut)
-
-    automatons = list()
-    automatons.append(list_auts.pop(0))
-    automatons.append(list_auts.pop(0))
-    aux_aut = reg_aux.concat_op(automatons)
-    list_auts.insert(0, aux_aut)
-
-    aux_aut = reg_aux.concat_op(list_auts)
-    aux_aut2 = reg_aux.rename_aut(aux_aut)
-    aux_aut2.minimize()
-
-    finals_aut.append(aux_aut2)
-
-    # ########## Union of the automata created above ##########
-
-    automatons = list()
-    while len(finals_aut) > 1:
-        automatons.append(finals_aut.pop(0))
-        automatons.append(finals_aut.pop(0))
-        aut = reg_aux.or_op(automatons)
-        aut2 = reg_aux.rename_aut(aut)
-        finals_aut.append(aut2)
-        automatons = list()
-
-    _aut = finals_aut.pop(0)
-    _aut.determinize()
-    final_aut = _aut
+
+def load_lexer():
+    """Reads the compiled lexer from the disk cache, or builds and stores it
+    when the entry is missing or unreadable. The columns of symbols that the
+    lexer never tells apart, such as most letters, are merged before storing.
+    """
+    key = cache_key(VERSION, source_digest(*BUILDER_MODULES),
+                    Builder.keywords, Builder.booleans, Builder.logic_ops,
+                    Builder.arit_ops, Builder.comp_ops, Builder.attr_ops,
+                    Builder.delimiters, Builder.identifier, Builder.integer,
+                    Builder.string, Builder.kinds)
+    data = read_entry('lexer', key)
+    if data is not None:
+        try:
+            return from_bytes(data)
+        except ValueError:
+            pass
+    automaton = compress_columns(compile_automaton(minimal_lexer()))
+    write_entry('lexer', key, automaton.to_bytes())
+    return automaton
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""disk_cache.py
+
+Tool for keeping the results of expensive constructions on disk between runs.
+Each entry is a binary file named after a hash of everything the result was
+built from, so changing any of its inputs simply misses the old entry.
+
+Gustavo Zambonin & Matheus Ben-Hur de Melo Leite, UFSC, November 2015.
+"""
+
+import hashlib
+import importlib.util
+import os
+import tempfile
+
+
+def cache_dir():
+    """Returns the folder of the cache, which may be set through the
+    RLTOOLS_CACHE environment variable.
+    """
+    default = os.path.join(os.path.expanduser('~'), '.cache', 'rltools')
+    return os.environ.get('RLTOOLS_CACHE', default)
+
+
+def cache_key(*parts):
+    """Hashes the given strings into the name of a cache entry."""
+    digest = hashlib.sha256()
+    for part in parts:
+        data = str(part).encode('utf8')
+        digest.update(str(len(data)).encode('ascii') + b':' + data)
+    return digest.hexdigest()
+
+
+def source_digest(*modules):
+    """Hashes the source code of the given modules, named as in an import,
+    so an entry built by them is missed as soon as any of them changes.
+    A module whose source cannot be read is hashed by its name alone.
+    """
+    digest = hashlib.sha256()
+    for name in modules:
+        digest.update(name.encode('utf8') + b'\0')
+        spec = importlib.util.find_spec(name)
+        try:
+            with open(spec.origin, 'rb') as f:
+                digest.update(f.read())
+        except (AttributeError, OSError, TypeError):
+            pass
+    return digest.hexdigest()
+
+
+def read_entry(prefix, key):
+    """Reads a cache entry.
+
+    Arguments:
+        prefix: the kind of object stored, such as 'lexer'.
+        key: the hash computed by cache_key.
+
+    Returns:
+        The stored bytes, or None when the entry does not exist.
+    """
+    try:
+        with open(os.path.join(cache_dir(), prefix + '-' + key), 'rb') as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def write_entry(prefix, key, data):
+    """Writes a cache entry atomically, so concurrent runs never read a
+    partial file. Failing to write (a read-only home, for instance) is not an
+    error, the result just will not be cached.
+
+    Arguments:
+        prefix: the kind of object stored, such as 'lexer'.
+        key: the hash computed by cache_key.
+        data: the bytes to be stored.
+    """
+    folder = cache_dir()
+    try:
+        os.makedirs(folder, exist_ok=True)
+        handle, temp = tempfile.mkstemp(dir=folder, prefix='.tmp-')
+        try:
+            with os.fdopen(handle, 'wb') as f:
+                f.write(data)
+            os.replace(temp, os.path.join(folder, prefix + '-' + key))
+        except OSError:
+            os.unlink(temp)
+            raise
+    except OSError:
+        pass
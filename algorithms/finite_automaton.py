@@ -12,6 +12,14 @@ Gustavo Zambonin & Matheus Ben-Hur de Melo Leite, UFSC, October 2015.
 from copy import deepcopy
 
 
+def bits(mask):
+    """Yields the position of every bit set in an integer bitset."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
 class FiniteAutomaton(object):
     """A finite automaton is defined as a 5-tuple (Q, Σ, δ, q0, F) such that:
     Q is a finite set of states;
@@ -19,15 +27,20 @@ class FiniteAutomaton(object):
     δ : Q × Σ → Q (or, verbally, a transition function);
     q0 ∈ Q is a start state;
     F ⊆ Q is a set of accept states.
+    Accept states may also carry a tag, a tuple (priority, kind) telling
+    which kind of word they recognize. When states are merged, the tag with
+    the lowest priority number wins.
     """
 
-    def __init__(self, states, alphabet, transitions, initstate, final_states):
+    def __init__(self, states, alphabet, transitions, initstate, final_states,
+                 tags=None):
         """Inits FiniteAutomaton with the attributes introduced above."""
         self.states = states
         self.alphabet = alphabet
         self.transitions = transitions
         self.init_state = initstate
         self.final_states = final_states
+        self.tags = tags if tags is not None else {}
         self.epsilon = "ε"
 
     def __str__(self):
@@ -44,99 +57,291 @@ class FiniteAutomaton(object):
         return "%s\n%s\n%s\n%s\n%s" % (states, alphabet, transitions,
                                        init_state, final)
 
+    def indexed_transitions(self):
+        """Numbers the states of the automaton after their transition keys, so
+        that sets of states can be handled as integer bitsets.
+
+        Returns:
+            A tuple (keys, moves, resolve): keys[i] is the transition key of
+            state i, moves[i] maps each letter (epsilon included) to the list
+            of state numbers it reaches, and resolve converts any way a set of
+            states is written in the automaton to such a list.
+        """
+        keys = list(self.transitions)
+        index = {key: i for i, key in enumerate(keys)}
+
+        def number(key):
+            if key not in index:
+                index[key] = len(keys)
+                keys.append(key)
+            return index[key]
+
+        def resolve(dest):
+            if isinstance(dest, str):
+                return [number(frozenset([dest]))]
+            key = frozenset(dest)
+            if key in index:
+                return [index[key]]
+            return [number(atom if isinstance(atom, frozenset)
+                           else frozenset([atom])) for atom in key]
+
+        moves = [{letter: resolve(dest) for letter, dest in
+                  self.transitions[key].items()} for key in list(keys)]
+        for state in self.states:
+            resolve([state] if isinstance(state, str) else state)
+        moves += [{} for _ in range(len(keys) - len(moves))]
+        return keys, moves, resolve
+
+    def closure_masks(self, moves):
+        """Computes every epsilon-closure at once, as bitsets, in a single
+        depth-first pass. Tarjan's algorithm yields the strongly connected
+        components of the epsilon-moves in reverse topological order, so the
+        closure of a component is its own states united with the closures
+        already known for its successors.
+
+        Arguments:
+            moves: the numbered transitions, as given by indexed_transitions.
+
+        Returns:
+            A list with the epsilon-closure bitset of each state.
+        """
+        eps = [m.get(self.epsilon, ()) for m in moves]
+        order, low = [None] * len(eps), [0] * len(eps)
+        closures, on_stack = [0] * len(eps), [False] * len(eps)
+        stack, counter = [], 0
+
+        for root in range(len(eps)):
+            if order[root] is not None:
+                continue
+            order[root] = low[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack[root] = True
+            work = [(root, iter(eps[root]))]
+            while work:
+                v, successors = work[-1]
+                for w in successors:
+                    if order[w] is None:
+                        order[w] = low[w] = counter
+                        counter += 1
+                        stack.append(w)
+                        on_stack[w] = True
+                        work.append((w, iter(eps[w])))
+                        break
+                    elif on_stack[w]:
+                        low[v] = min(low[v], order[w])
+                else:
+                    work.pop()
+                    if work:
+                        u = work[-1][0]
+                        low[u] = min(low[u], low[v])
+                    if low[v] == order[v]:
+                        component, mask = [], 0
+                        while True:
+                            w = stack.pop()
+                            on_stack[w] = False
+                            component.append(w)
+                            mask |= 1 << w
+                            if w == v:
+                                break
+                        for w in component:
+                            for x in eps[w]:
+                                mask |= closures[x]
+                        for w in component:
+                            closures[w] = mask
+        return closures
+
     def epsilon_closure(self):
         """Computes the epsilon-closure for each state of the input NFA.
 
         Returns:
             The set of every epsilon-closure of the NFA.
         """
+        keys, moves, resolve = self.indexed_transitions()
+        closures = self.closure_masks(moves)
+        closure = {}
+        for state in self.states:
+            i = resolve([state] if isinstance(state, str) else state)[0]
+            closure[state] = {atom for j in bits(closures[i])
+                              for atom in keys[j]}
+        return closure
 
-        def single_closure(state):
-            """Computes the epsilon-closure for a single state of a NFA.
+    def determinize(self):
+        """Modifies the input automaton in-place to be caracterized as a
+        determinized finite automaton. Subsets of states are interned as
+        integer bitsets and explored through a worklist, each epsilon-closure
+        being computed only once and each state's move-then-close result
+        being cached per letter, so the work done is linear in the number of
+        new states generated.
+        """
+        letters = [l for l in self.alphabet if l != self.epsilon]
+        keys, moves, resolve = self.indexed_transitions()
+        init = resolve([self.init_state] if isinstance(self.init_state, str)
+                       else self.init_state)
+        final_mask = 0
+        for state in self.final_states:
+            for i in resolve([state] if isinstance(state, str) else state):
+                final_mask |= 1 << i
+        tags, tag_mask = {}, 0
+        for state, tag in self.tags.items():
+            for i in resolve([state] if isinstance(state, str) else state):
+                tags[i] = min(tag, tags.get(i, tag))
+                tag_mask |= 1 << i
+        closures = self.closure_masks(moves)
 
-            Arguments:
-                state: the source state for the epsilon-closure computation.
+        closed_moves = []
+        for move in moves:
+            closed = []
+            for letter in letters:
+                mask = 0
+                for dest in move.get(letter, ()):
+                    mask |= closures[dest]
+                closed.append(mask)
+            closed_moves.append(closed)
 
-            Returns:
-                The epsilon-closure for said state.
-            """
-            closure, old_closure = {state, }, set()
-            while old_closure != closure:
-                old_closure = closure.copy()
-                for state in old_closure:
-                    try:
-                        s = frozenset([state])
-                        closure |= self.transitions[s][self.epsilon]
-                    except KeyError:
-                        pass
-            return closure
-
-        return {state: single_closure(state) for state in self.states}
+        init_mask = 0
+        for i in init:
+            init_mask |= closures[i]
+        subsets, interned, rows = [init_mask], {init_mask}, []
+        for mask in subsets:
+            row = [0] * len(letters)
+            for i in bits(mask):
+                for c, dest in enumerate(closed_moves[i]):
+                    row[c] |= dest
+            for dest in row:
+                if dest and dest not in interned:
+                    interned.add(dest)
+                    subsets.append(dest)
+            rows.append(row)
 
-    def determinize(self):
-        """Modifies the input automaton in-place to be caracterized as a
-        determinized finite automaton.
+        names = {mask: frozenset(atom for i in bits(mask) for atom in keys[i])
+                 for mask in subsets}
+        self.transitions = {
+            names[mask]: {letter: set(names[dest]) if dest else set()
+                          for letter, dest in zip(letters, row)}
+            for mask, row in zip(subsets, rows)}
+        self.states = set(self.transitions)
+        self.init_state = set(names[init_mask])
+        self.final_states = {names[mask] for mask in subsets
+                             if mask & final_mask}
+        self.tags = {names[mask]: min(tags[i] for i in bits(mask & tag_mask))
+                     for mask in subsets if mask & final_mask & tag_mask}
+
+    def minimize(self, method='hopcroft'):
+        """Modifies the input automaton in-place so the resulting DFA has the
+        minimum number of states.
+
+        Arguments:
+            method: 'hopcroft' for the O(kn log n) partition refinement, or
+                'classic' for the original quadratic refinement, kept for
+                cross-checking the results of the former.
+
+        Raises:
+            ValueError: when the method is unknown.
         """
-        opened, closed, final_states = set(), set(), set()
-        new_transitions = {}
+        if method not in ('hopcroft', 'classic'):
+            raise ValueError("unknown minimization method: %s" % method)
+        self.determinize()
+        if method == 'hopcroft':
+            self.hopcroft_minimize()
+        else:
+            self.classic_minimize()
+
+    def hopcroft_minimize(self):
+        """Implements Hopcroft's algorithm over a determinized automaton. The
+        states are numbered and completed with a sink state, an inverse
+        transition index is built for each letter and the partition between
+        reject states and accept states (one block per tag) is refined by a
+        worklist of splitter blocks. Whenever a block is split, only the
+        smaller half needs to be added to the worklist, unless the block
+        itself was still waiting there.
+        """
+        alphabet = [l for l in self.alphabet if l != self.epsilon]
+        states = list(self.transitions)
+        index = {state: i for i, state in enumerate(states)}
+        sink = len(states)
+        delta = [[sink] * len(alphabet) for _ in range(sink + 1)]
+        inverse = [[[] for _ in range(sink + 1)] for _ in alphabet]
+        for i, state in enumerate(states):
+            for c, letter in enumerate(alphabet):
+                dest = self.transitions[state].get(letter, set())
+                if isinstance(dest, str):
+                    dest = [dest]
+                delta[i][c] = index.get(frozenset(dest), sink)
+        for i in range(sink + 1):
+            for c in range(len(alphabet)):
+                inverse[c][delta[i][c]].append(i)
 
-        epsilon_closure = self.epsilon_closure()
-        try:
-            init_closure = epsilon_closure[frozenset([self.init_state])]
-        except KeyError:
-            init_closure = epsilon_closure[self.init_state]
-        new_init_state = init_closure
-        opened.add(frozenset(init_closure))
-
-        while opened:
-            state = opened.pop()
-            closed.add(state)
-            try:
-                new_transition = {}
-                for letter in self.transitions[state]:
-                    new_transition[letter] = set()
-                    for atom in self.transitions[state][letter]:
-                        new_transition[letter] |= epsilon_closure[atom]
-                new_transitions[state] = new_transition
-            except KeyError:
-                pass
-
-            if state not in self.transitions.keys():
-                aux_dict = {letter: set() for letter in self.alphabet}
-                for atom in state:  # an atom is each part of a new state
-                    for letter in self.alphabet:
-                        aux = self.transitions[frozenset([atom])][letter]
-                        for dest in aux:
-                            aux_dict[letter] |= epsilon_closure[dest]
-                self.transitions[state] = aux_dict
-                new_transitions[state] = aux_dict
-
-            for key in self.transitions[state]:
-                aux_state, new_state = self.transitions[state][key], set()
-                for atom in aux_state:
-                    new_state |= epsilon_closure[atom]
-                if new_state not in opened | closed and new_state:
-                    opened.add(frozenset(new_state))
-                    try:
-                        ns = frozenset(new_state)
-                        new_transitions[ns] = self.transitions[ns]
-                    except KeyError:
-                        pass
+        finals = {index[s] for s in self.final_states if s in index}
+        by_tag = {}
+        for i in finals:
+            by_tag.setdefault(self.tags.get(states[i]), set()).add(i)
+        blocks = [b for b in [set(range(sink + 1)) - finals] +
+                  list(by_tag.values()) if b]
+        block_of = [0] * (sink + 1)
+        for b, block in enumerate(blocks):
+            for i in block:
+                block_of[i] = b
+        worklist = set(range(len(blocks)))
+        worklist.remove(max(worklist, key=lambda b: len(blocks[b])))
 
-        for state in self.final_states:
-            for new_state in new_transitions:
-                if state & new_state:
-                    final_states.add(new_state)
-        self.final_states = final_states
-        self.init_state = new_init_state
-        self.states.clear()
-        for state in new_transitions:
-            self.states.add(state)
+        while worklist:
+            splitter = list(blocks[worklist.pop()])
+            for c in range(len(alphabet)):
+                touched = {}
+                for dest in splitter:
+                    for src in inverse[c][dest]:
+                        touched.setdefault(block_of[src], set()).add(src)
+                for b, inside in touched.items():
+                    if len(inside) == len(blocks[b]):
+                        continue
+                    blocks[b] -= inside
+                    blocks.append(inside)
+                    new = len(blocks) - 1
+                    for i in inside:
+                        block_of[i] = new
+                    if b in worklist or len(inside) <= len(blocks[b]):
+                        worklist.add(new)
+                    else:
+                        worklist.add(b)
+
+        init = index.get(frozenset([self.init_state])
+                         if isinstance(self.init_state, str)
+                         else frozenset(self.init_state), sink)
+        names, order = {}, [block_of[init]]
+        seen = set(order)
+        for b in order:
+            if b == block_of[sink] and b != block_of[init]:
+                continue
+            names[b] = "q" + str(len(names) + 1)
+            i = next(iter(blocks[b]))
+            for c in range(len(alphabet)):
+                dest = block_of[delta[i][c]]
+                if dest not in seen:
+                    seen.add(dest)
+                    order.append(dest)
+
+        new_transitions = {}
+        for b, name in names.items():
+            i = next(iter(blocks[b]))
+            new_transitions[frozenset([name])] = {
+                letter: {names[block_of[delta[i][c]]]}
+                if block_of[delta[i][c]] != block_of[sink] else set()
+                for c, letter in enumerate(alphabet)}
+
+        self.states = set(names.values())
         self.transitions = new_transitions
+        self.init_state = names[block_of[init]]
+        self.final_states = {frozenset([names[b]]) for b in names
+                             if blocks[b] & finals}
+        self.tags = {frozenset([names[b]]): self.tags[states[i]]
+                     for b, i in ((b, next(iter(blocks[b]))) for b in names)
+                     if i < sink and states[i] in self.tags}
 
-    def minimize(self):
-        """Modifies the input automaton in-place through an algorithm similar
-        to Hopcroft's so the resulting DFA has the minimum number of states.
+    def classic_minimize(self):
+        """Modifies the determinized automaton in-place through an algorithm
+        similar to Hopcroft's, comparing every state against the equivalence
+        classes of the previous round until none of them changes.
         """
         def belongs_to(self, state):
             """Auxiliar method for the partition refinement logic, also known
@@ -148,8 +353,10 @@ class FiniteAutomaton(object):
             Returns:
                 A new partition with the respective states.
             """
+            home = next(old for old in old_classes if state in old)
             for lst in classes:
-                if len(lst) > 1 or lst not in old_classes:
+                if lst and lst[0] in home and \
+                   (len(lst) > 1 or lst not in old_classes):
                     for letter in self.transitions[lst[0]]:
                         both = False
                         arrival_list = list()
@@ -182,6 +389,7 @@ class FiniteAutomaton(object):
             new_init = ""
             new_transitions = {}
             new_finals = set()
+            new_tags = {}
             for classs in classes:
                 i += 1
                 new_states.add("q" + str(i))
@@ -194,11 +402,14 @@ class FiniteAutomaton(object):
                         if state in classss:
                             aux_class = classss
                             break
-                    if set(state).pop() in self.init_state:
+                    if state == frozenset(self.init_state):
                         new_init = str(mapping[frozenset(aux_class)])
                     if state in self.final_states:
                         new_finals.add(
                             frozenset([mapping[frozenset(aux_class)]]))
+                    if state in self.tags:
+                        new_tags[frozenset([mapping[
+                            frozenset(aux_class)]])] = self.tags[state]
                     for letter in self.transitions[state]:
                         try:
                             new_transitions[frozenset([mapping[
@@ -223,12 +434,14 @@ class FiniteAutomaton(object):
             self.transitions = new_transitions
             self.init_state = new_init
             self.final_states = new_finals
+            self.tags = new_tags
             self.states = new_states
 
-        self.determinize()
-
         classes, old_classes = list(), list()
-        classes.append(list(self.final_states))
+        by_tag = {}
+        for state in self.final_states:
+            by_tag.setdefault(self.tags.get(state), []).append(state)
+        classes.extend(by_tag.values())
         if len(list(self.states - self.final_states)) > 0:
             classes.append(list(self.states - self.final_states))
 
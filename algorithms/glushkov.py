@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""glushkov.py
+
+Glushkov's construction, which turns a regular expression into its position
+automaton: one state for each occurrence of a symbol in the expression, plus
+the start state. The result never has epsilon-moves, so determinizing it
+needs no epsilon-closures.
+
+Gustavo Zambonin & Matheus Ben-Hur de Melo Leite, UFSC, November 2015.
+"""
+
+from algorithms.finite_automaton import FiniteAutomaton
+from algorithms.regex_ast import Class, Concat, Epsilon, Star, Symbol, \
+    leaf_letters, partition
+
+
+def glushkov(tree, atoms=None):
+    """Builds the position automaton of a regular expression. Each node of
+    the syntax tree gets, bottom-up, whether it accepts the empty word and
+    the sets of positions that may start (first) and end (last) its words;
+    meanwhile, the follow set of each position collects the positions that
+    may come right after it.
+
+    Arguments:
+        tree: the root of a syntax tree, as given by regex_ast.parse.
+        atoms: the letters of the symbols, as given by regex_ast.partition,
+            which must have seen the tree. By default, the atoms of the tree
+            alone are used.
+
+    Returns:
+        A FiniteAutomaton without epsilon-moves whose states are q0, the
+        start state, and q1 to qn, the n symbol (or class) occurrences of
+        the expression, in order.
+    """
+    if atoms is None:
+        atoms = partition([tree])
+    letters, follow = [None], [None]
+    done, stack = [], [(tree, False)]
+    while stack:
+        node, visited = stack.pop()
+        if isinstance(node, (Symbol, Class)):
+            letters.append(leaf_letters(node, atoms))
+            follow.append(set())
+            position = len(letters) - 1
+            done.append((False, {position}, {position}))
+        elif isinstance(node, Epsilon):
+            done.append((True, set(), set()))
+        elif not visited:
+            stack.append((node, True))
+            children = (node.part,) if isinstance(node, Star) else node.parts
+            stack.extend((child, False) for child in reversed(children))
+        elif isinstance(node, Star):
+            nullable, first, last = done.pop()
+            for position in last:
+                follow[position] |= first
+            done.append((True, first, last))
+        else:
+            parts = done[len(done) - len(node.parts):]
+            del done[len(done) - len(node.parts):]
+            if isinstance(node, Concat):
+                nullable, first, last = parts[0]
+                first, last = set(first), set(last)
+                for part_nullable, part_first, part_last in parts[1:]:
+                    for position in last:
+                        follow[position] |= part_first
+                    if nullable:
+                        first |= part_first
+                    last = last | part_last if part_nullable else \
+                        set(part_last)
+                    nullable = nullable and part_nullable
+            else:
+                nullable, first, last = False, set(), set()
+                for part_nullable, part_first, part_last in parts:
+                    nullable = nullable or part_nullable
+                    first |= part_first
+                    last |= part_last
+            done.append((nullable, first, last))
+    nullable, first, last = done.pop()
+
+    names = ['q%d' % i for i in range(len(letters))]
+    alphabet = {letter for leaf in letters[1:] for letter in leaf}
+    transitions = {}
+    for i, nexts in enumerate([first] + follow[1:]):
+        row = {letter: set() for letter in alphabet}
+        for position in nexts:
+            for letter in letters[position]:
+                row[letter].add(names[position])
+        transitions[frozenset([names[i]])] = row
+    finals = {frozenset([names[i]]) for i in last}
+    if nullable:
+        finals.add(frozenset([names[0]]))
+    return FiniteAutomaton(set(names), alphabet, transitions, names[0],
+                           finals)
@@ -3,32 +3,180 @@
 
 """io_manager.py
 
-Tool for loading and saving objects as JSON files. All handle_ methods are
-simply calculations to maintain the format of the files.
+Tool for loading and saving objects as JSON files, which is also able to load
+the binary containers of binary_format. All handle_ methods are simply
+calculations to maintain the format of the files. Files are written and read
+piece by piece, one state (or production rule) at a time, so neither the
+whole document nor a second copy of the object is ever held in memory.
 
 Gustavo Zambonin & Matheus Ben-Hur de Melo Leite, UFSC, October 2015.
 """
 
 import json
-from copy import deepcopy
+import re
+from algorithms.binary_format import is_container, read_container
 from algorithms.finite_automaton import FiniteAutomaton
 from algorithms.regular_grammar import RegularGrammar
 
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+class JSONReader(object):
+    """Reads a JSON document from a file a piece at a time. Objects and
+    arrays may be walked item by item through pairs and items, whose
+    consumer must read each value (with value, pairs or items) before
+    asking for the next one; any other value is decoded whole.
+
+    Attributes:
+        file_in: the file being read.
+        buffer: the text read but not yet consumed, from position pos on.
+        eof: whether the file has no more text.
+    """
+
+    def __init__(self, file_in, chunk=1 << 16):
+        """Inits JSONReader with the attributes introduced above, reading
+        chunk characters at a time.
+        """
+        self.file_in, self.chunk = file_in, chunk
+        self.buffer, self.pos, self.eof = '', 0, False
+        self.decoder = json.JSONDecoder()
+
+    def fill(self, size):
+        """Reads at least size more characters, unless the file ends."""
+        more = self.file_in.read(max(size, self.chunk))
+        self.buffer = self.buffer[self.pos:] + more
+        self.pos = 0
+        self.eof = not more
+
+    def peek(self):
+        """Skips whitespace and returns the next character, or an empty
+        string at the end of the file.
+        """
+        while True:
+            if self.pos < len(self.buffer):
+                if self.buffer[self.pos] not in ' \t\n\r':
+                    return self.buffer[self.pos]
+                self.pos = WHITESPACE.match(self.buffer, self.pos).end()
+            elif self.eof:
+                return ''
+            else:
+                self.fill(self.chunk)
+
+    def expect(self, char):
+        """Consumes the given character.
+
+        Raises:
+            ValueError: if the next character is another one.
+        """
+        if self.peek() != char:
+            raise ValueError("expected %r in the JSON file" % char)
+        self.pos += 1
+
+    def value(self):
+        """Decodes the next value. The buffer grows until the value and the
+        character after it are in it, so values cut by a chunk boundary
+        are read whole. A number followed by '.', 'e' or 'E' was cut in its
+        fraction or exponent, as nothing else may follow it there.
+        """
+        self.peek()
+        while True:
+            try:
+                result, end = self.decoder.raw_decode(self.buffer, self.pos)
+                cut = end == len(self.buffer) or \
+                    self.buffer[end] in '.eE' and \
+                    isinstance(result, (int, float))
+                if not cut or self.eof:
+                    self.pos = end
+                    return result
+            except ValueError:
+                if self.eof:
+                    raise
+            self.fill(len(self.buffer) - self.pos)
+
+    def walk(self, opening, closing):
+        """Yields once for each item of the next object or array."""
+        self.expect(opening)
+        if self.peek() == closing:
+            self.pos += 1
+            return
+        while True:
+            yield
+            if self.peek() == closing:
+                self.pos += 1
+                return
+            self.expect(',')
+
+    def pairs(self):
+        """Yields the keys of the next object; after each one, its value is
+        to be read by the caller.
+        """
+        for _ in self.walk('{', '}'):
+            key = self.value()
+            self.expect(':')
+            yield key
+
+    def items(self):
+        """Yields the values of the next array."""
+        for _ in self.walk('[', ']'):
+            yield self.value()
+
+
+def write_object(file_out, pairs, indent=4, depth=0, encoder=None):
+    """Writes a JSON object one pair at a time, formatted as json.dump would.
+
+    Arguments:
+        file_out: the file being written.
+        pairs: an iterable of pairs (key, value). A value may itself be an
+            iterator of pairs, which is written as a nested object in the
+            same way.
+        indent: the number of spaces per level, or None for a compact
+            document without line breaks.
+        depth: the nesting level of the object.
+        encoder: the json.JSONEncoder of the values, shared by the nested
+            objects.
+    """
+    if indent is None:
+        newline, closing, separators = '', '', (',', ':')
+    else:
+        newline = '\n' + ' ' * (indent * (depth + 1))
+        closing = '\n' + ' ' * (indent * depth)
+        separators = (',', ': ')
+    if encoder is None:
+        encoder = json.JSONEncoder(indent=indent, ensure_ascii=False,
+                                   separators=separators)
+    file_out.write('{')
+    first = True
+    for key, value in pairs:
+        file_out.write(('' if first else ',') + newline +
+                       json.dumps(key, ensure_ascii=False) + separators[1])
+        first = False
+        if hasattr(value, '__next__'):
+            write_object(file_out, value, indent, depth + 1, encoder)
+        else:
+            text = encoder.encode(value)
+            file_out.write(text.replace('\n', newline) if indent else text)
+    file_out.write('}' if first else closing + '}')
+
 
 def load(path):
-    """Converts a JSON file into a valid automaton or grammar."""
+    """Converts a JSON file, or a binary container as written by
+    binary_format.write_container, into a valid automaton or grammar.
+    """
     def handle_states(states):
         if isinstance(states[0], list):
             return {frozenset(i) for i in states}
         return set(states)
 
-    def handle_transitions(old_dict):
-        new = {frozenset(i.split(',')): old_dict[i] for i in old_dict}
-        for i in new:
-            for j in new[i]:
-                new[i][j] = set(new[i][j])
+    def handle_transitions(reader):
+        new = {}
+        for i in reader.pairs():
+            new[frozenset(i.split(','))] = {j: set(k) for j, k
+                                            in reader.value().items()}
         return new
 
+    def handle_productions(reader):
+        return {i: set(reader.value()) for i in reader.pairs()}
+
     def handle_final(final_s):
         new = set()
         for i in final_s:
@@ -38,42 +186,63 @@ def load(path):
                 new.add(frozenset([i]))
         return new
 
-    with open(path) as file_in:
-        data = json.load(file_in)
+    if is_container(path):
+        return read_container(path)
+
+    with open(path, encoding='utf8') as file_in:
+        reader = JSONReader(file_in)
+        data = {}
+        for key in reader.pairs():
+            if key == 'transitions':
+                data[key] = handle_transitions(reader)
+            elif key == 'productions':
+                data[key] = handle_productions(reader)
+            else:
+                data[key] = reader.value()
         header = data['type']
 
         if header == 'automaton':
             return FiniteAutomaton(handle_states(data['states']),
                                    data['alphabet'],
-                                   handle_transitions(data['transitions']),
+                                   data['transitions'],
                                    data['init_state'],
                                    handle_final(data['final_states']))
 
         if header == 'grammar':
             return RegularGrammar(set(data['non_terminals']),
                                   set(data['terminals']),
-                                  {i: set(data['productions'][i])
-                                      for i in data['productions']},
+                                  data['productions'],
                                   data['init_production'])
 
 
-def save(path, header, obj):
-    """Transforms the output of the computations into a readable file."""
+def save(path, header, obj, indent=4):
+    """Transforms the output of the computations into a readable file. The
+    object is only read, never copied nor changed, so it may be saved and
+    used again without doubling its memory, and its transitions are written
+    as they are converted, one state at a time.
+
+    Arguments:
+        path: where the file is written.
+        header: 'automaton', 'grammar' or 'regexp'.
+        obj: the object to be saved.
+        indent: the number of spaces per level of the JSON document, or
+            None for a compact one without line breaks.
+    """
+    def handle_dest(dest):
+        if not isinstance(dest, set):
+            return dest.split(',')
+        new_trans = []
+        for k in dest:
+            if isinstance(k, frozenset):
+                new_trans += list(k)
+            else:
+                new_trans += [k]
+        return new_trans
+
     def handle_transitions(old_dict):
-        new = {",".join(l for l in list(i)): old_dict[i] for i in old_dict}
-        for i in new:
-            for j in new[i]:
-                if isinstance(new[i][j], set):
-                    new_trans = []
-                    for k in new[i][j]:
-                        if isinstance(k, frozenset):
-                            new_trans += list(k)
-                        else:
-                            new_trans += [k]
-                    new[i][j] = new_trans
-                else:
-                    new[i][j] = new[i][j].split(',')
-        return new
+        return ((",".join(l for l in list(i)),
+                 {j: handle_dest(old_dict[i][j]) for j in old_dict[i]})
+                for i in old_dict)
 
     def handle_states(old_list, old_init, old_final):
         def handle_list(old):
@@ -95,6 +264,10 @@ def save(path, header, obj):
                     init = [oldi]
             elif ",".join(oldi) in oldl:
                 init = list(set(oldi))
+            else:
+                # the atoms of a subset state, such as the start of a
+                # determinized automaton loaded back from a file
+                init = [oldi] if isinstance(oldi, str) else list(oldi)
             if len(init) > 1:
                 return init
             return init[0]
@@ -102,34 +275,33 @@ def save(path, header, obj):
         return (handle_list(old_list), handle_init(old_list, old_init),
                 handle_list(old_final))
 
-    obj = deepcopy(obj)
     with open(path, 'w', encoding='utf8') as file_out:
         if header == 'automaton':
             t = handle_states(obj.states, obj.init_state, obj.final_states)
-            json.dump({
-                      'type': 'automaton',
-                      'states': t[0],
-                      'alphabet': list(obj.alphabet),
-                      'transitions': handle_transitions(obj.transitions),
-                      'init_state': t[1],
-                      'final_states': t[2],
-                      }, file_out, indent=4, ensure_ascii=False)
+            write_object(file_out, [
+                ('type', 'automaton'),
+                ('states', t[0]),
+                ('alphabet', list(obj.alphabet)),
+                ('transitions', handle_transitions(obj.transitions)),
+                ('init_state', t[1]),
+                ('final_states', t[2]),
+                ], indent)
 
         if header == 'grammar':
-            json.dump({
-                      'type': 'grammar',
-                      'non_terminals': list(obj.non_terminals),
-                      'terminals': list(obj.terminals),
-                      'productions': {i: list(obj.productions[i])
-                                      for i in obj.productions},
-                      'init_production': obj.init_production,
-                      }, file_out, indent=4, ensure_ascii=False)
+            write_object(file_out, [
+                ('type', 'grammar'),
+                ('non_terminals', list(obj.non_terminals)),
+                ('terminals', list(obj.terminals)),
+                ('productions', ((i, list(obj.productions[i]))
+                                 for i in obj.productions)),
+                ('init_production', obj.init_production),
+                ], indent)
 
         if header == 'regexp':
-            json.dump({
-                      'type': 'regexp',
-                      'expression': obj,
-                      }, file_out, indent=4, ensure_ascii=False)
+            write_object(file_out, [
+                ('type', 'regexp'),
+                ('expression', obj),
+                ], indent)
 
 
 def read_source(in_file):
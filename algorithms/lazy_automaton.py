@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""lazy_automaton.py
+
+On-the-fly simulation of the determinized version of a nondeterministic finite
+automaton. Instead of running the whole powerset construction up front, only
+the subsets of states actually reached by the input are built, and kept in a
+bounded cache.
+
+Gustavo Zambonin & Matheus Ben-Hur de Melo Leite, UFSC, November 2015.
+"""
+
+from algorithms.compiled_automaton import DEAD
+from algorithms.finite_automaton import bits
+from algorithms.regex_ast import is_class_label, letter_chars
+
+
+class LazyAutomaton(object):
+    """A lazy DFA wraps a nondeterministic finite automaton, with or without
+    epsilon-moves, and offers the same stepping interface as a compiled
+    automaton. Each new subset of states receives a number the first time a
+    scan reaches it, and each transition is computed the first time it is
+    taken. When the cache holds too many subsets, it is flushed entirely and
+    the scan restarts filling it from the current state on, so the memory
+    used stays capped no matter how large the powerset would be.
+
+    A state number is valid only until the next call to step, except for the
+    start state, which is always the number 0.
+
+    Attributes:
+        nfa: the nondeterministic automaton being simulated.
+        cache_size: the maximum number of subsets kept at once.
+        flushes: how many times the cache was emptied.
+    """
+
+    def __init__(self, nfa, cache_size=10000):
+        """Inits LazyAutomaton with the attributes introduced above.
+
+        Raises:
+            ValueError: when the cache cannot hold at least two subsets.
+        """
+        if cache_size < 2:
+            raise ValueError("the cache must hold at least two states")
+        self.nfa = nfa
+        self.cache_size = cache_size
+        self.flushes = 0
+
+        keys, moves, resolve = nfa.indexed_transitions()
+        closures = nfa.closure_masks(moves)
+        self.closed_moves = []
+        for move in moves:
+            closed = {}
+            for letter, dests in move.items():
+                mask = 0
+                for dest in dests:
+                    mask |= closures[dest]
+                if mask and letter != nfa.epsilon:
+                    closed[letter] = mask
+            self.closed_moves.append(closed)
+
+        self.init_mask = 0
+        init = nfa.init_state
+        for i in resolve([init] if isinstance(init, str) else init):
+            self.init_mask |= closures[i]
+        self.final_mask = 0
+        for state in nfa.final_states:
+            for i in resolve([state] if isinstance(state, str) else state):
+                self.final_mask |= 1 << i
+        self.nfa_tags, self.tag_mask = {}, 0
+        for state, tag in nfa.tags.items():
+            for i in resolve([state] if isinstance(state, str) else state):
+                self.nfa_tags[i] = min(tag, self.nfa_tags.get(i, tag))
+                self.tag_mask |= 1 << i
+        self.labels = {}
+        for letter in nfa.alphabet:
+            if is_class_label(letter):
+                for char in letter_chars(letter):
+                    self.labels.setdefault(char, letter)
+        self.init_state = 0
+        self.flush()
+
+    def __len__(self):
+        """Returns the number of subsets currently cached."""
+        return len(self.subsets)
+
+    def flush(self):
+        """Empties the cache, keeping only the start state."""
+        self.subsets, self.numbers, self.rows = [], {}, []
+        self.finals, self.tags = [], []
+        self.intern(self.init_mask)
+
+    def intern(self, mask):
+        """Numbers a new subset of states.
+
+        Arguments:
+            mask: the bitset of NFA states.
+
+        Returns:
+            The number given to the subset.
+        """
+        self.numbers[mask] = len(self.subsets)
+        self.subsets.append(mask)
+        self.rows.append({})
+        self.finals.append(bool(mask & self.final_mask))
+        tagged = mask & self.final_mask & self.tag_mask
+        self.tags.append(min(self.nfa_tags[i] for i in bits(tagged))[1]
+                         if tagged else None)
+        return self.numbers[mask]
+
+    def is_final(self, state):
+        """Checks whether the given state number is an accept state."""
+        return state != DEAD and self.finals[state]
+
+    def tag(self, state):
+        """Returns the kind of word recognized by the given state, if any."""
+        return self.tags[state] if state != DEAD else None
+
+    def step(self, state, symbol):
+        """Computes a single transition, building it if it is still unknown.
+
+        Arguments:
+            state: the number of the current state (possibly DEAD).
+            symbol: the symbol read from the input.
+
+        Returns:
+            The number of the next state, or DEAD if there is none.
+        """
+        if state == DEAD:
+            return DEAD
+        symbol = self.labels.get(symbol, symbol)
+        dest = self.rows[state].get(symbol)
+        if dest is not None:
+            return dest
+
+        mask, target = self.subsets[state], 0
+        for i in bits(mask):
+            target |= self.closed_moves[i].get(symbol, 0)
+        if not target:
+            dest = DEAD
+        else:
+            dest = self.numbers.get(target)
+            if dest is None:
+                if len(self.subsets) >= self.cache_size:
+                    self.flush()
+                    self.flushes += 1
+                    state = self.numbers.get(mask)
+                    if state is None:
+                        state = self.intern(mask)
+                dest = self.numbers.get(target)
+                if dest is None:
+                    dest = self.intern(target)
+        self.rows[state][symbol] = dest
+        return dest
+
+    def run(self, word, state=None):
+        """Feeds a whole word to the automaton.
+
+        Arguments:
+            word: an iterable of symbols.
+            state: where the computation starts, the start state by default.
+
+        Returns:
+            The number of the state reached, or DEAD.
+        """
+        if state is None:
+            state = self.init_state
+        for symbol in word:
+            state = self.step(state, symbol)
+            if state == DEAD:
+                break
+        return state
+
+    def accepts(self, word):
+        """Checks whether the word belongs to the language of the automaton."""
+        return self.is_final(self.run(word))
@@ -3,152 +3,183 @@
 
 """ll_parser.py
 
-Simple implementation of an LL(1) parser, with the grammar produced by hand.
+Simple implementation of an LL(1) parser, whose table is generated from the
+grammar.
 
 Gustavo Zambonin & Matheus Ben-Hur de Melo Leite, UFSC, November 2015.
 """
 
+from algorithms.ll_table import load_table
+
+GRAMMAR = """
+<S>       ::= program ; <INST> begin <PROGRAM> ;
+<INST>    ::= <TYPE> identifier = <CONTENT> ; <INST> | ε
+<TYPE>    ::= type | list
+<CONTENT> ::= digit | boolean | string | list
+<PROGRAM> ::= <ATTR> <PROGRAM> | <LOOP> <PROGRAM> | <COND> <PROGRAM>
+            | <IO> <PROGRAM> | end
+<ATTR>    ::= identifier = <EXP> ;
+<LOOP>    ::= while <LOGEXP> begin <PROGRAM> end ;
+<COND>    ::= if <LOGEXP> <PROGRAM> <COND'>
+<COND'>   ::= else <PROGRAM> end | end
+<LOGEXP>  ::= identifier <LOGEXP'>
+<LOGEXP'> ::= comp_op identifier | logic_op identifier | ε
+<IO>      ::= read identifier | write <CONTENT>
+<EXP>     ::= <T> <E'>
+<E'>      ::= + <T> <E'> | - <T> <E'> | ε
+<T>       ::= <F> <T'>
+<T'>      ::= × <F> <T'> | / <F> <T'> | ε
+<F>       ::= identifier | digit | boolean | string | ( <EXP> )
+"""
+
+MATCH = 'Your program matches the grammar.'
+
+# terminals standing for whole kinds of tokens of the lexical structure;
+# the remaining kinds (reserved words, arithmetic operators and delimiters)
+# are terminals by themselves
+KINDS = {'IDNT': 'identifier', 'INTG': 'digit', 'STRG': 'string',
+         'BOOL': 'boolean', 'CPOP': 'comp_op', 'LGOP': 'logic_op',
+         'ATOP': '='}
+# the reserved words read as the type terminal; list is a terminal of its
+# own, as it may be both the type and the value of a variable
+TYPES = frozenset(['int', 'bool', 'str'])
+
 
 class Parser(object):
     """An LL(1) parser is a top-down parser for a subset of context-free
     languages. It parses the input from left to right, performing a
     leftmost derivation of the sentence, using a single token as
     lookahead. Formally, it is a deterministic pushdown automaton.
-    """
-    
-    def __init__(self):
-        """Inits a Parser object."""
-        master = {
-            "<S>": {
-                'program':    'program ; <INST> begin <PROGRAM> ;'
-            },
-            "<INST>": {
-                'type':       'type identifier = <CONTENT> ; <INST>',
-                'begin':      'ε'
-            },
-            "<CONTENT>": {
-                'digit':      'digit',
-                'boolean':    'boolean',
-                'string':     'string',
-                'list':       'list'
-            },
-            "<PROGRAM>": {
-                'identifier': '<ATTR> <PROGRAM>',
-                'while':      '<LOOP> <PROGRAM>',
-                'if':         '<COND> <PROGRAM>',
-                'read':       '<IO> <PROGRAM>',
-                'write':      '<IO> <PROGRAM>',
-                'end':        'end'
-            },
-            "<ATTR>": {
-                'identifier': 'identifier = <EXP> ;'
-            },
-            "<LOOP>": {
-                'while':      'while <LOGEXP> begin <PROGRAM> end ;'
-            },
-            "<COND>": {
-                'if':         'if <LOGEXP> <PROGRAM> <COND\'>'
-            },
-            "<COND'>": {
-                'else':       'else <PROGRAM> end',
-                'end':        'end'
-            },
-            "<LOGEXP>": {
-                'identifier': 'identifier <LOGEXP\'>'
-            },
-            "<LOGEXP'>": {
-                'comp_op':    'comp_op identifier',
-                'begin':      'ε',
-                'identifier': 'ε',
-                'while':      'ε',
-                'if':         'ε',
-                'else':       'ε',
-                'read':       'ε',
-                'write':      'ε',
-                'logic_op':   'comp_op identifier'
-            },
-            "<IO>": {
-                'read':       'read identifier',
-                'write':      'write <CONTENT>'
-            },
-            "<EXP>": {
-                'identifier': '<T> <E\'>',
-                'digit':      '<T> <E\'>',
-                'boolean':    '<T> <E\'>',
-                'string':     '<T> <E\'>',
-                '(':          '<T> <E\'>'
-            },
-            "<E'>": {
-                '+':          '+ <T> <E\'>',
-                '-':          '- <T> <E\'>',
-                ';':          'ε',
-                ')':          'ε'
-            },
-            "<T>": {
-                'identifier': '<F> <T\'>',
-                'digit':      '<F> <T\'>',
-                'boolean':    '<F> <T\'>',
-                'string':     '<F> <T\'>',
-                '(':          '<F> <T\'>'
-            },
-            "<T'>": {
-                '×':          '× <F> <T\'>',
-                '/':          '/ <F> <T\'>',
-                ';':          'ε',
-                '(':          'ε',
-                ')':          'ε',
-                '+':          'ε',
-                '-':          'ε'
-            },
-            "<F>": {
-                'identifier': 'identifier',
-                'digit':      'digit',
-                'boolean':    'boolean',
-                'string':     'string',
-                '(':          '( <EXP> )'
-            }
-        }
-
-        self.grammar = stackable_prod(master)
-
-
-def stackable_prod(grm):
-    """Splits the production rules in stackable pieces
-
-    Arguments:
-        grm: the grammar, with the productions in string form.
 
-    Returns:
-        The grammar with lists as productions.
+    Attributes:
+        table: the integer-coded parse table generated from the grammar.
+        grammar: the same table, as used by derive.
+        keywords: the terminals of the grammar that the lexical structure
+            reads as identifiers, such as 'program' and 'begin'.
     """
-    for i in grm:
-        for j in grm[i]:
-            grm[i][j] = grm[i][j].split()
-    return grm
-
 
-def derive(grammar, buffer, st=['$', '<S>']):
-    """Responsible for derivating, recursively, the buffer of words from the
-    grammar, with the help of an explicit stack.
+    def __init__(self, text=GRAMMAR):
+        """Inits a Parser object from the text of an LL(1) grammar.
+
+        Raises:
+            ValueError: if the grammar is malformed or not LL(1).
+        """
+        self.table = load_table(text)
+        self.grammar = self.table.to_grammar()
+        self.keywords = set(self.table.terminals) - set(KINDS.values()) - \
+            {'type'}
+
+    def terminal(self, lexeme, kind):
+        """Translates a token of the lexical structure into a terminal of the
+        grammar.
+
+        Arguments:
+            lexeme: the word read from the source.
+            kind: its classification, as given by the Tokenizer.
+
+        Returns:
+            The terminal, as a string.
+        """
+        if kind == 'RSWD' and lexeme in TYPES:
+            return 'type'
+        if kind == 'IDNT' and lexeme in self.keywords:
+            return lexeme
+        return KINDS.get(kind, lexeme)
+
+    def parse(self, tokens):
+        """Analyzes the syntax of a stream of tokens. Each token is translated
+        and handed to derive as soon as its lookahead is needed, so lexing
+        and parsing happen in a single pass and the tokens are never stored.
+
+        Arguments:
+            tokens: tuples (lexeme, kind, line, column), as yielded by
+                Tokenizer.tokenize.
+
+        Returns:
+            A string that asserts the correctness of the provided source, or
+            describes its first lexical or syntax error, along with its
+            placement on the source.
+        """
+        # imported here, so --syn and the other subcommands that only load
+        # this module do not load the lexer along with it
+        from algorithms.tokenizer import ERROR
+        last = [None]
+
+        def words():
+            for token in tokens:
+                last[0] = token
+                if token[1] == ERROR:
+                    return
+                yield self.terminal(token[0], token[1])
+            last[0] = None
+
+        result = derive(self.grammar, words())
+        if last[0] is None:
+            return result
+        lexeme, kind, line, column = last[0]
+        if kind == ERROR:
+            return "Lexical error at line %d, column %d: '%s' not " \
+                "recognized." % (line, column, lexeme)
+        if result != MATCH:
+            return "Line %d, column %d: %s" % (line, column, result)
+        return result
+
+
+def derive(grammar, buffer, st=None):
+    """Responsible for derivating, iteratively, the buffer of words from the
+    grammar, with the help of an explicit stack. Each word is read only once,
+    so the time taken is linear in the size of the buffer.
 
     Arguments:
         grammar: a content-free grammar in LL(1) form.
-        buffer: the stream of words that will be analyzed.
-        st: the stack used as a helper for the derivations. It starts with the
-            end of sentence symbol and the first production of the grammar.
+        buffer: the stream of words that will be analyzed, which may be any
+            iterable (a list, or a generator of words).
+        st: the stack used as a helper for the derivations. By default, it
+            starts with the end of sentence symbol and the first production
+            of the grammar.
 
     Returns:
-        A string that asserts the correctness of the provided source.
+        A string that asserts the correctness of the provided source, or
+        describes the first syntax error found in it.
     """
-    if not st and not buffer:
-        return 'Your program matches the grammar.'
-
-    top = st.pop()
-
-    if {'<', '>'}.intersection(set(list(top))):
-        st += grammar[top][buffer[0]][::-1]
+    stack = list(st) if st is not None else ['$', '<S>']
+    words = iter(buffer)
+    position, word = 1, next(words, '$')
+
+    while stack:
+        top = stack.pop()
+        if top == 'ε':
+            continue
+        if top in grammar:
+            production = grammar[top].get(word)
+            if production is None:
+                return error(position, word, "one of " + ", ".join(
+                    "'%s'" % w for w in sorted(grammar[top])))
+            stack.extend(reversed(production))
+        elif top == word:
+            if top != '$':
+                position, word = position + 1, next(words, '$')
+        elif top == '$':
+            return error(position, word, "the end of the program")
+        else:
+            return error(position, word, "'%s'" % top)
+
+    if word != '$':
+        return error(position, word, "the end of the program")
+    return MATCH
+
+
+def error(position, word, expected):
+    """Formats a syntax error message.
 
-    if buffer and buffer[0] == top:
-        buffer = buffer[1:]
+    Arguments:
+        position: the index of the offending word, starting at 1.
+        word: the offending word, or the end of sentence symbol.
+        expected: what would have been accepted instead.
 
-    return derive(grammar, buffer, st)
+    Returns:
+        The message, as a string.
+    """
+    found = "the end of the program" if word == '$' else "'%s'" % word
+    return "Syntax error at word %d: expected %s, found %s." % (
+        position, expected, found)
@@ -0,0 +1,335 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""ll_table.py
+
+Generation of predictive parse tables for LL(1) grammars. The grammar is
+written as text, one rule per line in a BNF-like notation:
+
+    <EXP> ::= <T> <E'>
+    <E'>  ::= + <T> <E'> | - <T> <E'> | ε
+
+Symbols are separated by spaces, nonterminals are enclosed in angle brackets
+and the head of the first rule is the start symbol. A line starting with '|'
+continues the alternatives of the previous rule, and '#' starts a comment.
+
+Gustavo Zambonin & Matheus Ben-Hur de Melo Leite, UFSC, November 2015.
+"""
+
+import json
+import struct
+import sys
+from array import array
+from algorithms.disk_cache import cache_key, read_entry, source_digest, \
+    write_entry
+
+EPSILON, END = 'ε', '$'
+NONE = -1
+MAGIC, VERSION = b'RLLL1', 1
+HEADER = struct.Struct('<5sHI')
+
+
+class ParseTable(object):
+    """An integer-coded LL(1) parse table. Every symbol is numbered: the
+    terminals first, with the end of sentence symbol last among them, then
+    the nonterminals, the start symbol being the first of these.
+
+    Attributes:
+        terminals: the terminal symbols, indexed by their number.
+        nonterminals: the nonterminal symbols, in the order of the rules.
+        productions: tuples (head, body) of symbol numbers, the body being
+            empty for the ε-productions.
+        table: a flat array('i') where the production used to expand the
+            nonterminal n when the lookahead is the terminal t is found at
+            n * len(terminals) + t, or NONE if it is a syntax error. Here n
+            counts among the nonterminals only.
+    """
+
+    def __init__(self, terminals, nonterminals, productions, table):
+        """Inits ParseTable with the attributes introduced above."""
+        self.terminals = tuple(terminals)
+        self.nonterminals = tuple(nonterminals)
+        self.productions = tuple((head, tuple(body))
+                                 for head, body in productions)
+        self.table = table
+
+    def symbol(self, code):
+        """Returns the name of the symbol with the given number."""
+        if code < len(self.terminals):
+            return self.terminals[code]
+        return self.nonterminals[code - len(self.terminals)]
+
+    def to_grammar(self):
+        """Expands the table in the form used by ll_parser.derive.
+
+        Returns:
+            A dictionary mapping each nonterminal to another one, from each
+            lookahead terminal to the body of the production to be stacked,
+            as a list of symbol names.
+        """
+        width, grammar = len(self.terminals), {}
+        for n, nonterminal in enumerate(self.nonterminals):
+            row = grammar[nonterminal] = {}
+            for t, terminal in enumerate(self.terminals):
+                production = self.table[n * width + t]
+                if production != NONE:
+                    row[terminal] = [self.symbol(s) for s in
+                                     self.productions[production][1]]
+        return grammar
+
+    def to_bytes(self):
+        """Serializes the table: a header, the symbols and productions in
+        JSON, and the table itself as little-endian 32-bit integers.
+        """
+        symbols = json.dumps([self.terminals, self.nonterminals,
+                              self.productions]).encode('utf8')
+        table = array('i', self.table)
+        if sys.byteorder != 'little':
+            table.byteswap()
+        return HEADER.pack(MAGIC, VERSION, len(symbols)) + symbols + \
+            table.tobytes()
+
+
+def from_bytes(data):
+    """Rebuilds a parse table serialized by its to_bytes method.
+
+    Raises:
+        ValueError: if the data is not in the expected format or version.
+    """
+    try:
+        magic, version, length = HEADER.unpack_from(data)
+    except struct.error:
+        raise ValueError("truncated parse table")
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("unknown parse table format")
+    start = HEADER.size + length
+    terminals, nonterminals, productions = json.loads(
+        bytes(data[HEADER.size:start]).decode('utf8'))
+    table = array('i')
+    table.frombytes(bytes(data[start:]))
+    if sys.byteorder != 'little':
+        table.byteswap()
+    if len(table) != len(terminals) * len(nonterminals):
+        raise ValueError("truncated parse table")
+    return ParseTable(terminals, nonterminals, productions, table)
+
+
+def parse_grammar(text):
+    """Reads a grammar in the notation described above.
+
+    Arguments:
+        text: the grammar, as a string.
+
+    Returns:
+        A list of pairs (head, body) with the productions, in order, where
+        each body is a list of symbols (empty for ε).
+
+    Raises:
+        ValueError: if a line is not a rule, or a nonterminal has no rules.
+    """
+    productions, head = [], None
+    for number, line in enumerate(text.splitlines(), 1):
+        line = line.split('#', 1)[0].strip()
+        if not line:
+            continue
+        if line.startswith('|'):
+            if head is None:
+                raise ValueError("line %d: alternative without a rule"
+                                 % number)
+            body = line[1:]
+        else:
+            head, arrow, body = line.partition('::=')
+            head = head.strip()
+            if not arrow or not is_nonterminal(head) or ' ' in head:
+                raise ValueError("line %d: expected '<head> ::= body'"
+                                 % number)
+        for alternative in body.split('|'):
+            symbols = [s for s in alternative.split() if s != EPSILON]
+            productions.append((head, symbols))
+
+    heads = {head for head, body in productions}
+    for head, body in productions:
+        for symbol in body:
+            if is_nonterminal(symbol) and symbol not in heads:
+                raise ValueError("%s has no rules" % symbol)
+    return productions
+
+
+def is_nonterminal(symbol):
+    """Checks whether a symbol of the grammar is a nonterminal."""
+    return len(symbol) > 2 and symbol[0] == '<' and symbol[-1] == '>'
+
+
+def propagate(sets, edges):
+    """Closes a family of sets under inclusion constraints, following a
+    worklist: a set is only visited again after one of its sources grows.
+
+    Arguments:
+        sets: a dictionary of sets, updated in place.
+        edges: a dictionary mapping each key to the keys whose sets must
+            include its set.
+    """
+    worklist = list(sets)
+    pending = set(worklist)
+    while worklist:
+        source = worklist.pop()
+        pending.discard(source)
+        for target in edges.get(source, ()):
+            if not sets[source] <= sets[target]:
+                sets[target] |= sets[source]
+                if target not in pending:
+                    pending.add(target)
+                    worklist.append(target)
+
+
+def nullable_set(productions):
+    """Finds the nonterminals that derive the empty sentence. Each production
+    keeps a count of the body symbols not yet known to be nullable, and its
+    head becomes nullable when the count drops to zero.
+    """
+    nullable, worklist = set(), []
+    missing, uses = [], {}
+    for i, (head, body) in enumerate(productions):
+        missing.append(len(body))
+        for symbol in body:
+            uses.setdefault(symbol, []).append(i)
+        if not body and head not in nullable:
+            nullable.add(head)
+            worklist.append(head)
+    while worklist:
+        symbol = worklist.pop()
+        for i in uses.get(symbol, ()):
+            missing[i] -= 1
+            head = productions[i][0]
+            if not missing[i] and head not in nullable:
+                nullable.add(head)
+                worklist.append(head)
+    return nullable
+
+
+def first_sets(productions, nullable):
+    """Computes the FIRST set of every nonterminal.
+
+    Returns:
+        A dictionary mapping each nonterminal to the set of terminals that
+        may start a sentence derived from it.
+    """
+    first = {head: set() for head, body in productions}
+    edges = {}
+    for head, body in productions:
+        for symbol in body:
+            if not is_nonterminal(symbol):
+                first[head].add(symbol)
+                break
+            edges.setdefault(symbol, set()).add(head)
+            if symbol not in nullable:
+                break
+    propagate(first, edges)
+    return first
+
+
+def follow_sets(productions, nullable, first):
+    """Computes the FOLLOW set of every nonterminal.
+
+    Returns:
+        A dictionary mapping each nonterminal to the set of terminals that
+        may appear right after it in a sentential form, END included.
+    """
+    follow = {head: set() for head, body in productions}
+    follow[productions[0][0]].add(END)
+    edges = {}
+    for head, body in productions:
+        trailer, open_end = set(), True
+        for symbol in reversed(body):
+            if not is_nonterminal(symbol):
+                trailer, open_end = {symbol}, False
+                continue
+            follow[symbol] |= trailer
+            if open_end:
+                edges.setdefault(head, set()).add(symbol)
+            if symbol in nullable:
+                trailer = trailer | first[symbol]
+            else:
+                trailer, open_end = set(first[symbol]), False
+    propagate(follow, edges)
+    return follow
+
+
+def build_table(text):
+    """Generates the LL(1) parse table of a grammar.
+
+    Arguments:
+        text: the grammar, in the notation described above.
+
+    Returns:
+        The ParseTable of the grammar.
+
+    Raises:
+        ValueError: if the grammar is malformed, or it is not LL(1), in which
+            case every conflicting entry is listed.
+    """
+    productions = parse_grammar(text)
+    if not productions:
+        raise ValueError("the grammar has no rules")
+    nullable = nullable_set(productions)
+    first = first_sets(productions, nullable)
+    follow = follow_sets(productions, nullable, first)
+
+    nonterminals = list(dict.fromkeys(head for head, body in productions))
+    terminals = list(dict.fromkeys(
+        symbol for head, body in productions for symbol in body
+        if not is_nonterminal(symbol)))
+    terminals.append(END)
+    codes = {symbol: i for i, symbol in enumerate(terminals + nonterminals)}
+    width = len(terminals)
+
+    table = array('i', [NONE]) * (width * len(nonterminals))
+    conflicts = []
+    for i, (head, body) in enumerate(productions):
+        lookahead, empty = set(), True
+        for symbol in body:
+            if not is_nonterminal(symbol):
+                lookahead.add(symbol)
+                empty = False
+                break
+            lookahead |= first[symbol]
+            if symbol not in nullable:
+                empty = False
+                break
+        if empty:
+            lookahead |= follow[head]
+        row = (codes[head] - width) * width
+        for terminal in lookahead:
+            entry = table[row + codes[terminal]]
+            if entry != NONE and entry != i:
+                conflicts.append("%s on '%s': %s | %s" % (
+                    head, terminal,
+                    " ".join(productions[entry][1]) or EPSILON,
+                    " ".join(body) or EPSILON))
+            else:
+                table[row + codes[terminal]] = i
+    if conflicts:
+        raise ValueError("the grammar is not LL(1):\n" +
+                         "\n".join(sorted(conflicts)))
+
+    coded = [(codes[head], [codes[s] for s in body])
+             for head, body in productions]
+    return ParseTable(terminals, nonterminals, coded, table)
+
+
+def load_table(text):
+    """Reads the parse table of a grammar from the disk cache, or generates
+    and stores it when the entry is missing or unreadable. The entry is
+    keyed by the grammar, the version of the binary format and the source
+    of this module, which generates the table.
+    """
+    key = cache_key(VERSION, source_digest(__name__), text)
+    data = read_entry('ll1', key)
+    if data is not None:
+        try:
+            return from_bytes(data)
+        except ValueError:
+            pass
+    table = build_table(text)
+    write_entry('ll1', key, table.to_bytes())
+    return table
@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""parallel_lexer.py
+
+Lexical analysis of many source files, or of a single huge one, spread over a
+pool of processes. The compiled lexer is serialized once and loaded by each
+worker, instead of being rebuilt by every one of them. In the lazy mode, each
+worker determinizes the lexical structure on the fly instead, as the
+Tokenizer does, and nothing is compiled.
+
+Gustavo Zambonin & Matheus Ben-Hur de Melo Leite, UFSC, November 2015.
+"""
+
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from algorithms.compiled_automaton import from_bytes
+from algorithms.complex_builder import compiled_lexer
+from algorithms.tokenizer import Tokenizer
+
+worker = None
+
+
+def init_worker(data, munch):
+    """Prepares the tokenizer of a worker process.
+
+    Arguments:
+        data: the lexer automaton, as given by CompiledAutomaton.to_bytes,
+            or None for the lazy mode.
+        munch: whether the maximal munch scanning mode should be used.
+    """
+    global worker
+    if data is None:
+        worker = Tokenizer(lazy=True, munch=munch)
+    else:
+        worker = Tokenizer(automaton=from_bytes(data), munch=munch)
+
+
+def lexer_data(lazy):
+    """Returns what init_worker needs to prepare the tokenizers."""
+    return None if lazy else compiled_lexer().to_bytes()
+
+
+def lex_file(path):
+    """Runs in a worker: reads a whole file and returns its token list."""
+    with open(path, 'r') as file:
+        return list(worker.tokenize(file))
+
+
+def lex_shard(path, start, end):
+    """Runs in a worker: scans the bytes of a file between two line breaks.
+    They are decoded as lex_file reads them, with the default encoding and
+    universal newlines, so both paths give the same tokens.
+
+    Returns:
+        A tuple with the tokens of the shard, whose line numbers are relative
+        to its first line, and the number of lines in it.
+    """
+    with open(path, 'rb') as file:
+        file.seek(start)
+        chunk = file.read(end - start)
+    text = io.TextIOWrapper(io.BytesIO(chunk), newline=None).read()
+    return list(worker.tokenize([text])), text.count("\n")
+
+
+def source_files(targets):
+    """Expands folders into the files inside them, recursively and in a
+    deterministic (sorted) order.
+
+    Arguments:
+        targets: a list of file and folder paths.
+
+    Returns:
+        The list of file paths.
+    """
+    paths = []
+    for target in targets:
+        if os.path.isdir(target):
+            for root, folders, files in os.walk(target):
+                folders.sort()
+                paths.extend(os.path.join(root, f) for f in sorted(files))
+        else:
+            paths.append(target)
+    return paths
+
+
+def lex_files(paths, workers=None, munch=False, lazy=False):
+    """Analyzes many files in parallel.
+
+    Arguments:
+        paths: the source files.
+        workers: the number of processes, one per CPU by default.
+        munch: whether the maximal munch scanning mode should be used.
+        lazy: whether the lexer is determinized on the fly.
+
+    Yields:
+        Tuples (path, tokens), in the order the paths were given, with tokens
+        as described in Tokenizer.tokenize.
+    """
+    with ProcessPoolExecutor(workers, initializer=init_worker,
+                             initargs=(lexer_data(lazy), munch)) as pool:
+        for path, tokens in zip(paths, pool.map(lex_file, paths)):
+            yield path, tokens
+
+
+def shard_bounds(path, shards):
+    """Cuts a file in byte ranges of roughly the same size, each of them
+    ending right after a line break (or at the end of the file).
+    """
+    size = os.path.getsize(path)
+    bounds, start = [], 0
+    with open(path, 'rb') as file:
+        for i in range(1, shards + 1):
+            if start >= size:
+                break
+            end = size * i // shards
+            if end < size and end > start:
+                file.seek(end - 1)
+                file.readline()
+                end = file.tell()
+            if end > start or i == shards:
+                bounds.append((start, max(end, start)))
+                start = end
+    return bounds
+
+
+def lex_large_file(path, workers=None, munch=False, shards=None,
+                   lazy=False):
+    """Analyzes a single file in parallel. Every line is scanned on its own
+    (not even strings may span lines), so the file is cut at line breaks and
+    the pieces are analyzed independently.
+
+    Arguments:
+        path: the source file.
+        workers: the number of processes, one per CPU by default.
+        munch: whether the maximal munch scanning mode should be used.
+        shards: in how many pieces the file is cut, four per worker by
+            default.
+        lazy: whether the lexer is determinized on the fly.
+
+    Yields:
+        The tokens of the file in order, as described in Tokenizer.tokenize.
+    """
+    workers = workers or os.cpu_count() or 1
+    bounds = shard_bounds(path, shards or 4 * workers)
+    with ProcessPoolExecutor(workers, initializer=init_worker,
+                             initargs=(lexer_data(lazy), munch)) as pool:
+        offset = 0
+        for tokens, lines in pool.map(lex_shard, [path] * len(bounds),
+                                      *zip(*bounds)):
+            for lexeme, kind, line, column in tokens:
+                yield lexeme, kind, line + offset, column
+            offset += lines
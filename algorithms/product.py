@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""product.py
+
+Boolean operations over finite automata through the product construction.
+The operands are determinized on the fly, each subset of their states being
+a bitset, and only the tuples of subsets reachable from the start are ever
+built, so the product is usually far smaller than the full cross product.
+Tuples that can no longer lead to acceptance are left out as they are found,
+and the result is minimized.
+
+Gustavo Zambonin & Matheus Ben-Hur de Melo Leite, UFSC, November 2015.
+"""
+
+import itertools
+from algorithms.finite_automaton import FiniteAutomaton, bits
+from algorithms.regex_ast import class_label, letter_chars
+
+
+def refine(automata, extra=()):
+    """Splits the symbols of several alphabets into common letters. Letters
+    may be class labels, such as [a-z], and different automata may split the
+    same symbols in different ways, so the symbols are grouped by the letter
+    standing for them in each automaton.
+
+    Arguments:
+        automata: a list of FiniteAutomaton.
+        extra: symbols to be added to the alphabet.
+
+    Returns:
+        A list of pairs (letter, originals), where letter is a symbol or a
+        class label, and originals holds the letter of each automaton that
+        stands for the same symbols, or None.
+    """
+    signatures = {}
+    for symbol in extra:
+        signatures.setdefault(symbol, [None] * len(automata))
+    for n, aut in enumerate(automata):
+        for letter in aut.alphabet:
+            if letter == aut.epsilon:
+                continue
+            for symbol in letter_chars(letter):
+                signatures.setdefault(symbol, [None] * len(automata))[n] = \
+                    letter
+    groups = {}
+    for symbol, signature in signatures.items():
+        # letters of several characters that are not class labels are
+        # opaque, so they are never grouped with other symbols
+        key = tuple(signature) + ((symbol,) if len(symbol) > 1 else ())
+        groups.setdefault(key, []).append(symbol)
+    letters = []
+    for key, symbols in groups.items():
+        letter = symbols[0] if len(symbols) == 1 else class_label(symbols)
+        letters.append((letter, key[:len(automata)]))
+    return sorted(letters)
+
+
+class Operand(object):
+    """An automaton taking part in a product, determinized on demand.
+
+    Attributes:
+        init: the bitset of its start states, epsilon-closure included.
+        finals: the bitset of its accept states.
+        closed: for each state, the closed bitset reached through each
+            letter of the product, or 0.
+        rows: the memoized successors of each subset already visited.
+    """
+
+    def __init__(self, aut, letters):
+        """Inits Operand from an automaton and, for each letter of the
+        product, the letter of the automaton standing for it (or None).
+        """
+        keys, moves, resolve = aut.indexed_transitions()
+        closures = aut.closure_masks(moves)
+
+        def numbers(state):
+            return resolve([state] if isinstance(state, str) else state)
+
+        self.init = 0
+        if aut.init_state:
+            for i in numbers(aut.init_state):
+                self.init |= closures[i]
+        self.finals = 0
+        for state in aut.final_states:
+            for i in numbers(state):
+                self.finals |= 1 << i
+        self.closed = []
+        for move in moves:
+            closed = []
+            for letter in letters:
+                mask = 0
+                for dest in move.get(letter, ()) if letter else ():
+                    mask |= closures[dest]
+                closed.append(mask)
+            self.closed.append(closed)
+        self.rows = {}
+
+    def row(self, mask):
+        """Returns the subsets reached from a subset through each letter."""
+        if mask not in self.rows:
+            row = [0] * len(self.closed[0]) if self.closed else []
+            for i in bits(mask):
+                row = [a | b for a, b in zip(row, self.closed[i])]
+            self.rows[mask] = row
+        return self.rows[mask]
+
+
+def product(automata, accept, extra=(), minimize=True):
+    """Builds the product of automata, which runs all of them at once over
+    the common alphabet given by refine.
+
+    Arguments:
+        automata: a list of FiniteAutomaton, in any of their forms. They are
+            not changed.
+        accept: a function that tells, from a tuple with a boolean for each
+            automaton (whether it accepts), whether the product accepts.
+        extra: symbols to be added to the alphabet, over which the automata
+            have no transitions.
+        minimize: whether the result is minimized.
+
+    Returns:
+        The deterministic FiniteAutomaton of the product, with states named
+        q0, q1, ... unless it is minimized. Its start state is kept even
+        when it cannot lead to acceptance, so the result is never empty.
+    """
+    letters = refine(automata, extra)
+    operands = [Operand(aut, [originals[n] for _, originals in letters])
+                for n, aut in enumerate(automata)]
+
+    def alive(subsets):
+        # an empty subset stays empty, so the tuple can only lead to
+        # acceptance if some choice for the other automata is accepted
+        free = [n for n, mask in enumerate(subsets) if mask]
+        for values in itertools.product((False, True), repeat=len(free)):
+            result = [False] * len(subsets)
+            for n, value in zip(free, values):
+                result[n] = value
+            if accept(tuple(result)):
+                return True
+        return False
+
+    start = tuple(operand.init for operand in operands)
+    order, index, rows = [start], {start: 0}, []
+    for subsets in order:
+        successors = [operand.row(mask)
+                      for operand, mask in zip(operands, subsets)]
+        row = []
+        for dest in zip(*successors):
+            if dest not in index:
+                if not alive(dest):
+                    row.append(None)
+                    continue
+                index[dest] = len(order)
+                order.append(dest)
+            row.append(index[dest])
+        rows.append(row)
+
+    names = ['q%d' % i for i in range(len(order))]
+    transitions = {
+        frozenset([names[i]]): {
+            letter: {names[dest]} if dest is not None else set()
+            for (letter, _), dest in zip(letters, row)}
+        for i, row in enumerate(rows)}
+    finals = {frozenset([names[i]]) for i, subsets in enumerate(order)
+              if accept(tuple(bool(mask & operand.finals) for mask, operand
+                              in zip(subsets, operands)))}
+    result = FiniteAutomaton(set(names), {letter for letter, _ in letters},
+                             transitions, names[0], finals)
+    if minimize:
+        result.minimize()
+    return result
+
+
+def intersection(first, second):
+    """Builds the automaton of the words accepted by both automata."""
+    return product([first, second], all)
+
+
+def difference(first, second):
+    """Builds the automaton of the words accepted by the first automaton
+    but not by the second one.
+    """
+    return product([first, second], lambda accepts: accepts[0] and
+                   not accepts[1])
+
+
+def symmetric_difference(first, second):
+    """Builds the automaton of the words accepted by exactly one of the
+    automata.
+    """
+    return product([first, second], lambda accepts: accepts[0] !=
+                   accepts[1])
+
+
+def complement(aut, extra=()):
+    """Builds the automaton of the words rejected by an automaton, over its
+    own alphabet completed with the given symbols. Missing transitions lead
+    to a new sink state, which becomes an accept state.
+    """
+    return product([aut], lambda accepts: not accepts[0], extra)
@@ -0,0 +1,329 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""regex_ast.py
+
+Syntax trees of regular expressions, and the parser that builds them. The
+expression is read once, from left to right, with an explicit stack of open
+parentheses, so its length and nesting depth are only bounded by memory.
+
+Besides single symbols, an expression may hold character classes such as
+[a-z_] or [^"], and escaped operators such as \\( or \\*. The symbols used by
+an expression are split into atoms, the largest sets of symbols that no part
+of the expression tells apart, and each atom becomes a single letter of the
+alphabet of its automata.
+
+Gustavo Zambonin & Matheus Ben-Hur de Melo Leite, UFSC, November 2015.
+"""
+
+EPSILON = "ε"
+UNIVERSE = frozenset(map(chr, range(32, 127)))
+
+
+class Symbol(object):
+    """A leaf that matches a single symbol of the alphabet."""
+
+    __slots__ = ('letter',)
+
+    def __init__(self, letter):
+        """Inits Symbol with the given letter."""
+        self.letter = letter
+
+    def __repr__(self):
+        return 'Symbol(%r)' % self.letter
+
+
+class Class(object):
+    """A leaf that matches any symbol of a set."""
+
+    __slots__ = ('chars',)
+
+    def __init__(self, chars):
+        """Inits Class with the set of symbols it matches."""
+        self.chars = frozenset(chars)
+
+    def __repr__(self):
+        return 'Class(%r)' % class_label(self.chars)
+
+
+class Epsilon(object):
+    """A leaf that matches only the empty word."""
+
+    __slots__ = ()
+
+    def __repr__(self):
+        return 'Epsilon()'
+
+
+class Concat(object):
+    """The concatenation of two or more expressions, in order."""
+
+    __slots__ = ('parts',)
+
+    def __init__(self, parts):
+        """Inits Concat with a list of subexpressions."""
+        self.parts = tuple(parts)
+
+    def __repr__(self):
+        return 'Concat(%r)' % (list(self.parts),)
+
+
+class Union(object):
+    """The alternation of two or more expressions."""
+
+    __slots__ = ('parts',)
+
+    def __init__(self, parts):
+        """Inits Union with a list of subexpressions."""
+        self.parts = tuple(parts)
+
+    def __repr__(self):
+        return 'Union(%r)' % (list(self.parts),)
+
+
+class Star(object):
+    """The Kleene closure of an expression."""
+
+    __slots__ = ('part',)
+
+    def __init__(self, part):
+        """Inits Star with its subexpression."""
+        self.part = part
+
+    def __repr__(self):
+        return 'Star(%r)' % (self.part,)
+
+
+def concat(parts):
+    """Builds the concatenation of a list of expressions, dropping empty
+    words and flattening nested concatenations.
+    """
+    flat = []
+    for part in parts:
+        if isinstance(part, Concat):
+            flat.extend(part.parts)
+        elif not isinstance(part, Epsilon):
+            flat.append(part)
+    if not flat:
+        return Epsilon()
+    return flat[0] if len(flat) == 1 else Concat(flat)
+
+
+def union(parts):
+    """Builds the alternation of a list of expressions, flattening nested
+    alternations.
+    """
+    flat = []
+    for part in parts:
+        if isinstance(part, Union):
+            flat.extend(part.parts)
+        else:
+            flat.append(part)
+    return flat[0] if len(flat) == 1 else Union(flat)
+
+
+def parse(expression):
+    """Reads a regular expression into its syntax tree. The Kleene star has
+    priority over concatenation, which has priority over alternation, and an
+    empty operand (as in "a|" or "()") stands for the empty word.
+
+    Arguments:
+        expression: the regular expression in form of a string, in which ε
+            denotes the empty word, a backslash makes the next character a
+            plain symbol and brackets enclose character classes, as
+            described in class_chars.
+
+    Returns:
+        The root of the syntax tree.
+
+    Raises:
+        ValueError: if the parentheses or brackets are unbalanced, a star has
+            no operand, or an escape or class is malformed.
+    """
+    # each open group keeps its finished alternatives and the sequence of
+    # expressions being concatenated for the current one
+    groups = [([], [])]
+    i = 0
+    while i < len(expression):
+        char = expression[i]
+        i += 1
+        alternatives, sequence = groups[-1]
+        if char == "(":
+            groups.append(([], []))
+        elif char == ")":
+            if len(groups) == 1:
+                raise ValueError("unbalanced ')' at position %d" % (i - 1))
+            groups.pop()
+            alternatives.append(concat(sequence))
+            groups[-1][1].append(union(alternatives))
+        elif char == "|":
+            alternatives.append(concat(sequence))
+            groups[-1] = (alternatives, [])
+        elif char == "*":
+            if not sequence:
+                raise ValueError("'*' without operand at position %d"
+                                 % (i - 1))
+            if not isinstance(sequence[-1], Star):
+                sequence[-1] = Star(sequence[-1])
+        elif char == EPSILON:
+            sequence.append(Epsilon())
+        elif char == "\\":
+            if i == len(expression):
+                raise ValueError("escape at the end of the expression")
+            sequence.append(Symbol(expression[i]))
+            i += 1
+        elif char == "[":
+            end = class_end(expression, i)
+            sequence.append(Class(class_chars(expression[i - 1:end])))
+            i = end
+        else:
+            sequence.append(Symbol(char))
+    if len(groups) > 1:
+        raise ValueError("unbalanced '(' in the expression")
+    alternatives, sequence = groups[0]
+    alternatives.append(concat(sequence))
+    return union(alternatives)
+
+
+def class_end(expression, start):
+    """Finds where the character class opened right before start ends.
+
+    Returns:
+        The position right after its closing bracket.
+
+    Raises:
+        ValueError: if the class is never closed.
+    """
+    i = start
+    while i < len(expression):
+        if expression[i] == "\\":
+            i += 2
+        elif expression[i] == "]":
+            return i + 1
+        else:
+            i += 1
+    raise ValueError("unbalanced '[' at position %d" % (start - 1))
+
+
+def class_chars(text):
+    """Reads a character class. Inside the brackets, a-z stands for every
+    symbol from a to z, a backslash makes the next character a plain symbol
+    (such as \\] or \\-), and a leading ^ negates the class, which then matches
+    every printable ASCII character not listed.
+
+    Arguments:
+        text: the class, brackets included, such as "[a-zA-Z_]".
+
+    Returns:
+        The frozenset of symbols matched by the class.
+
+    Raises:
+        ValueError: if the class is malformed or matches no symbol.
+    """
+    body = text[1:-1]
+    negated = body.startswith("^")
+    if negated:
+        body = body[1:]
+    items, i = [], 0
+    while i < len(body):
+        if body[i] == "\\":
+            if i + 1 == len(body):
+                raise ValueError("escape at the end of the class %s" % text)
+            items.append((body[i + 1], True))
+            i += 2
+        else:
+            items.append((body[i], False))
+            i += 1
+
+    chars, i = set(), 0
+    while i < len(items):
+        if i + 2 < len(items) and items[i + 1] == ("-", False):
+            low, high = items[i][0], items[i + 2][0]
+            if low > high:
+                raise ValueError("reversed range %s-%s in the class %s"
+                                 % (low, high, text))
+            chars.update(map(chr, range(ord(low), ord(high) + 1)))
+            i += 3
+        else:
+            chars.add(items[i][0])
+            i += 1
+    if negated:
+        chars = UNIVERSE - chars
+    if not chars:
+        raise ValueError("the class %s matches no symbol" % text)
+    return frozenset(chars)
+
+
+def class_label(chars):
+    """Writes a set of symbols as a character class, in which runs of three
+    or more consecutive symbols become ranges. class_chars reads it back.
+    """
+    codes, parts, i = sorted(map(ord, chars)), [], 0
+    while i < len(codes):
+        j = i
+        while j + 1 < len(codes) and codes[j + 1] == codes[j] + 1:
+            j += 1
+        run = [chr(code) for code in codes[i:j + 1]]
+        run = [("\\" + c if c in "\\]^-" else c) for c in run]
+        parts.append(run[0] + "-" + run[-1] if len(run) > 2 else
+                     "".join(run))
+        i = j + 1
+    return "[" + "".join(parts) + "]"
+
+
+def is_class_label(letter):
+    """Checks whether a letter of an alphabet stands for a character class."""
+    return len(letter) > 2 and letter[0] == "[" and letter[-1] == "]"
+
+
+def letter_chars(letter):
+    """Returns the symbols stood for by a letter of an alphabet."""
+    return class_chars(letter) if is_class_label(letter) else {letter}
+
+
+def partition(trees):
+    """Splits the symbols used by syntax trees into atoms: two symbols are
+    in the same atom when every leaf matches both or neither of them.
+
+    Arguments:
+        trees: a list of syntax trees.
+
+    Returns:
+        A dictionary mapping each symbol to the letter of its atom, which is
+        the symbol itself for atoms of a single symbol, and the class label
+        of the atom otherwise.
+    """
+    sets, stack = set(), list(trees)
+    while stack:
+        node = stack.pop()
+        if isinstance(node, Symbol):
+            sets.add(frozenset([node.letter]))
+        elif isinstance(node, Class):
+            sets.add(node.chars)
+        elif isinstance(node, Star):
+            stack.append(node.part)
+        elif isinstance(node, (Concat, Union)):
+            stack.extend(node.parts)
+
+    signatures = {}
+    for number, chars in enumerate(sets):
+        for char in chars:
+            signatures.setdefault(char, []).append(number)
+    atoms = {}
+    for char, signature in signatures.items():
+        atoms.setdefault(tuple(signature), []).append(char)
+    letters = {}
+    for chars in atoms.values():
+        letter = chars[0] if len(chars) == 1 else class_label(chars)
+        for char in chars:
+            letters[char] = letter
+    return letters
+
+
+def leaf_letters(node, atoms):
+    """Returns the sorted letters of the atoms matched by a Symbol or Class
+    leaf, given the atoms computed by partition.
+    """
+    if isinstance(node, Symbol):
+        return [atoms[node.letter]]
+    return sorted({atoms[char] for char in node.chars})
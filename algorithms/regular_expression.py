@@ -5,12 +5,17 @@
 
 Definition of a regular expression and its conversion from and to finite
 automata, through generalized nondeterministic finite automaton (GNFA) and
-Thompson's construction algorithms, respectively.
+Thompson's, Glushkov's or Brzozowski's construction algorithms, respectively.
 
 Gustavo Zambonin & Matheus Ben-Hur de Melo Leite, UFSC, October 2015.
 """
 
+from algorithms.brzozowski import Derivatives
 from algorithms.finite_automaton import FiniteAutomaton
+from algorithms.glushkov import glushkov
+from algorithms.regex_ast import parse, partition
+from algorithms.state_elimination import eliminate
+from algorithms.thompson import Thompson
 
 
 class RegularExpression(object):
@@ -26,56 +31,36 @@ class RegularExpression(object):
           from another given set, i.e. {'a'} = {ε, 'a', 'aa', 'aaa', ...}.
     Parentheses can be used to denote the operations' application range, but if
     omitted, Kleene star has priority over concatenation that has priority
-    over alternation.
+    over alternation. The empty word may be written as ε. Character classes
+    match any of the symbols between brackets, such as [a-z_], or any
+    printable ASCII symbol but those, such as [^"], and a backslash turns an
+    operator into a plain symbol, such as \\*.
 
     Attributes:
         expression: the string for the regular expression.
-        alphabet: all symbols that are not operators or parentheses compose
-            the alphabet.
+        tree: its syntax tree.
+        atoms: the letter standing for each symbol in the automata of the
+            expression, as given by regex_ast.partition.
+        alphabet: the letters themselves. Each one is a symbol, or the
+            label of a class of symbols never told apart by the expression,
+            such as [a-z].
     """
 
     def __init__(self, expression):
         """Inits RegularGrammar with the attributes introduced above.
 
         Raises:
-            ValueError: when unknown operators are added to the expression.
+            ValueError: when unknown symbols are added to the expression, or
+                it is malformed.
         """
         self.expression = expression
-        valid_symbols = set(map(chr, range(32, 127))) - set("\\()|*") | {'×'}
+        valid_symbols = set(map(chr, range(32, 127))) | {'×'}
 
-        self.alphabet = {i for i in expression if i in valid_symbols}
-        valid_chars = set("()|*") | self.alphabet
-        if set(expression) - valid_chars:
-            raise ValueError
-
-    def diff_aut(self, automaton, suffix):
-        """Renames the automaton's states.
-
-        Arguments:
-            automaton: the automaton to be manipulated.
-            suffix: the chosen string to be added to the states.
-
-        Returns:
-            An automaton with different names for states.
-        """
-        aux_aut = FiniteAutomaton({state+suffix for state in automaton.states},
-                                  automaton.alphabet, {},
-                                  automaton.init_state + suffix,
-                                  {frozenset([set(state).pop() + suffix])
-                                      for state in automaton.final_states})
-
-        for state in automaton.transitions:
-            key = frozenset([set(state).pop() + suffix])
-            aux_aut.transitions[key] = {}
-            for symbol in automaton.transitions[state]:
-                aux_aut.transitions[key][symbol] = set()
-                for element in automaton.transitions[state][symbol]:
-                    if isinstance(element, str):
-                        element = [element]
-                    aux_aut.transitions[key][symbol].add(
-                        frozenset([set(element).pop() + suffix]))
-
-        return aux_aut
+        self.tree = parse(expression)
+        self.atoms = partition([self.tree])
+        if set(self.atoms) - valid_symbols:
+            raise ValueError("unknown symbols in the expression")
+        self.alphabet = set(self.atoms.values())
 
     def add_transitions(self, automaton):
         """Fills the missing transitions on an automaton.
@@ -100,28 +85,15 @@ class RegularExpression(object):
         """Implements the regular expression alternation operator.
 
         Arguments:
-            automatons: a list of two automatons to be merged.
+            automatons: a list of automatons to be merged.
 
         Returns:
             A single automaton that accepts either language its parts accepted.
         """
-        aut1 = self.diff_aut(automatons[0], "%")
-        aut2 = self.diff_aut(automatons[1], "&")
-        or_aut = FiniteAutomaton({"initOr"}, set(), {
-            frozenset(["initOr"]): {
-                aut1.epsilon: set()
-            }
-            }, "initOr", set())
-
-        for each in [aut1, aut2]:
-            or_aut.states |= each.states
-            or_aut.alphabet |= each.alphabet
-            or_aut.transitions.update(each.transitions)
-            or_aut.transitions[frozenset(["initOr"])][or_aut.epsilon].add(
-                each.init_state)
-            or_aut.final_states |= each.final_states
-
-        return self.add_transitions(or_aut)
+        thompson = Thompson()
+        fragment = thompson.union([thompson.include(aut)
+                                   for aut in automatons])
+        return thompson.to_automaton(fragment)
 
     def concat_op(self, automatons):
         """Implements the regular expression concatenation operator.
@@ -133,24 +105,10 @@ class RegularExpression(object):
             An automaton that accepts words starting with the first automaton
             language and ending with the last automaton language.
         """
-        aut1 = self.diff_aut(automatons[0], "#")
-        aut2 = self.diff_aut(automatons[1], "$")
-        concat_aut = FiniteAutomaton(aut1.states | aut2.states,
-                                     aut1.alphabet | aut2.alphabet, {},
-                                     aut1.init_state, aut2.final_states)
-        concat_aut.transitions.update(aut1.transitions)
-        concat_aut.transitions.update(aut2.transitions)
-
-        for state in aut1.final_states:
-            try:
-                concat_aut.transitions[state][concat_aut.epsilon].add(
-                    frozenset([aut2.init_state]))
-            except KeyError:
-                concat_aut.transitions[state][concat_aut.epsilon] = set()
-                concat_aut.transitions[state][concat_aut.epsilon].add(
-                    frozenset([aut2.init_state]))
-
-        return self.add_transitions(concat_aut)
+        thompson = Thompson()
+        fragment = thompson.concat(thompson.include(automatons[0]),
+                                   thompson.include(automatons[1]))
+        return thompson.to_automaton(fragment)
 
     def closure_op(self, automatons):
         """Implements the regular expression Kleene star operator.
@@ -162,30 +120,10 @@ class RegularExpression(object):
             An automaton that will accept any non-negative number of
             repetitions of its original language.
         """
-        clsr_aut = FiniteAutomaton(
-            {"initClsr"}, set(), {
-                frozenset(["initClsr"]): {
-                    automatons[0].epsilon: set()
-                }
-                }, "initClsr", {frozenset(["initClsr"])})
-
-        e = clsr_aut.epsilon
-        for each in automatons:
-            clsr_aut.states |= each.states
-            clsr_aut.alphabet |= each.alphabet
-            clsr_aut.transitions[frozenset(["initClsr"])][e].add(
-                frozenset([each.init_state]))
-            clsr_aut.transitions.update(each.transitions)
-            clsr_aut.final_states |= each.final_states
-            for state in each.final_states:
-                try:
-                    clsr_aut.transitions[state][e] = set()
-                except KeyError:
-                    clsr_aut.transitions[state] = {}
-                    clsr_aut.transitions[state][e] = set()
-                clsr_aut.transitions[state][e].add(frozenset(["initClsr"]))
-
-        return self.add_transitions(clsr_aut)
+        thompson = Thompson()
+        fragment = thompson.union([thompson.include(aut)
+                                   for aut in automatons])
+        return thompson.to_automaton(thompson.star(fragment))
 
     def single_state(self, transition):
         """Implements the most basic type of automaton.
@@ -216,121 +154,6 @@ class RegularExpression(object):
         """
         return FiniteAutomaton({"q0"}, set(), {}, "q0", {"q0"})
 
-    def analyse_expression(self, expression):
-        """Reads and consumes the given expression, organizing it into a list.
-
-        Arguments:
-            expression: the regular expression in form of a string.
-
-        Returns:
-            A list with a special notation denoting the order and priority of
-            the operators and symbols.
-        """
-        separator = "ε"
-        i = 0
-        _list = []
-        while len(expression) != 0:
-            if expression[i] in self.alphabet:
-                _list.append(expression[i])
-                expression = expression[:i] + expression[i+1:]
-            elif expression[i] == "|":
-                _list.append(separator)
-                _next = expression[i+1]
-                if _next == "(":
-                    aux = 2
-                    while _next != ")":
-                        _next = expression[i+aux]
-                        if _next != ")":
-                            _list.append(_next)
-                        aux += 1
-                    expression = expression[:i] + expression[i+aux:]
-                elif _next in self.alphabet:
-                    try:
-                        after_next = expression[i+2]
-                    except IndexError:
-                        after_next = ""
-                    it_num = 3
-                    nexts = list()
-                    while after_next in self.alphabet:
-                        nexts.append(after_next)
-                        try:
-                            after_next = expression[i+it_num]
-                        except IndexError:
-                            it_num += 1
-                            break
-                        it_num += 1
-                    _list.append(_next)
-                    _list.extend(nexts)
-                    if after_next == "*":
-                        _list.append(after_next)
-                        it_num += 1
-                    expression = expression[:i] + expression[i+(it_num-1):]
-                _list.append("|")
-            elif expression[i] in ["(", ")", "*"]:
-                if expression[i] == "*":
-                    _list.append("*")
-                if expression[i] == "(":
-                    _list.append(separator)
-                expression = expression[:i] + expression[i+1:]
-
-        return _list
-
-    def execute_operations(self, list):
-        """Assembles automata according to operators and symbols. It is a
-        representation of Thompson's construction algorithm idea: construct
-        basic automata and apply operations to them, the final product
-        getting more complex over every iteration of the list.
-
-        Arguments:
-            a list of symbols and operators with a respective order.
-
-        Returns:
-            The final automaton for a given regular expression.
-        """
-        partial_auts = []
-        while len(list) != 0:
-            char = list.pop(0)
-            if char == "ε":
-                aux_lst = []
-                _next = list.pop(0)
-                while _next in self.alphabet:
-                    aux_lst.append(self.single_state(_next))
-                    _next = list.pop(0)
-                    if _next == "*":
-                        aut = [aux_lst.pop()]
-                        aux_lst.append(self.closure_op(aut))
-                    if len(aux_lst) == 2:
-                        param_list = [aux_lst.pop(0)]
-                        param_list.append(aux_lst.pop(0))
-                        aux_lst.append(self.concat_op(param_list))
-
-                if len(partial_auts) == 2:
-                    aux_list = [partial_auts.pop(0)]
-                    aux_list.append(partial_auts.pop(0))
-                    partial_auts.append(self.concat_op(aux_list))
-                partial_auts.extend(aux_lst)
-                if _next != "*":
-                    list.insert(0, _next)
-            if char in self.alphabet:
-                if len(partial_auts) == 2:
-                    aux_list = [partial_auts.pop(0)]
-                    aux_list.append(partial_auts.pop(0))
-                    partial_auts.append(self.concat_op(aux_list))
-                partial_auts.append(self.single_state(char))
-            if char == "|":
-                if len(partial_auts) == 3:
-                    aux_list = [partial_auts.pop(1)]
-                    aux_list.append(partial_auts.pop())
-                    partial_auts.append(self.concat_op(aux_list))
-                partial_auts = [self.or_op(partial_auts)]
-            if char == "*":
-                aut = [partial_auts.pop()]
-                partial_auts.append(self.closure_op(aut))
-
-        if len(partial_auts) == 2:
-            return self.add_transitions(self.concat_op(partial_auts))
-        return self.add_transitions(partial_auts.pop())
-
     def rename_aut(self, automaton):
         """Makes the automaton's states' names readable.
 
@@ -353,6 +176,9 @@ class RegularExpression(object):
             if frozenset([i]) in automaton.final_states:
                 final_state = set([new_states[i]])
                 new_aut.final_states.add(frozenset(final_state))
+            if frozenset([i]) in automaton.tags:
+                new_aut.tags[frozenset([state])] = \
+                    automaton.tags[frozenset([i])]
             if i == automaton.init_state:
                 new_aut.init_state = new_states[i]
 
@@ -376,16 +202,39 @@ class RegularExpression(object):
 
         return new_aut
 
-    def regexp_to_automaton(self):
-        """Calls the right methods in the right order."""
-        final = self.execute_operations(
-            self.analyse_expression(self.expression))
-        return self.rename_aut(final)
+    def regexp_to_automaton(self, method='thompson'):
+        """Assembles the automaton of the expression from its syntax tree.
+
+        Arguments:
+            method: 'thompson' for Thompson's construction algorithm, where
+                basic automata for each symbol are joined by epsilon-moves
+                following the operators of the tree, or 'glushkov' for the
+                position automaton, which has no epsilon-moves and one state
+                per symbol occurrence, plus the start state, or 'brzozowski'
+                for the deterministic automaton whose states are the
+                derivatives of the expression.
+
+        Returns:
+            The automaton that accepts the language of the expression,
+            nondeterministic except for the last method.
 
-    def automaton_to_regexp(automaton):
-        """Converts a finite automaton into a vanilla, non-reduced regular
-        expression. It is an implementation of the generalized nondeterministic
-        finite automaton algorithm. The general idea will be described below:
+        Raises:
+            ValueError: when the method is unknown.
+        """
+        if method not in ('thompson', 'glushkov', 'brzozowski'):
+            raise ValueError("unknown construction method: %s" % method)
+        if method == 'glushkov':
+            return glushkov(self.tree, self.atoms)
+        if method == 'brzozowski':
+            return Derivatives().to_automaton(self.tree, self.atoms)
+        thompson = Thompson()
+        return thompson.to_automaton(thompson.expression(self.tree,
+                                                         self.atoms))
+
+    def automaton_to_regexp(automaton, method='elimination'):
+        """Converts a finite automaton into a regular expression. It is an
+        implementation of the generalized nondeterministic finite automaton
+        algorithm. The general idea will be described below:
           * add new initial state with epsilon-moves to the old initial state;
           * add new final state with epsilon-moves from the old final states;
           * remove one state at a time, except the ones just added, recomputing
@@ -393,14 +242,27 @@ class RegularExpression(object):
           * end the process when the only remaining states are the ones added.
 
         Arguments:
-            automaton: the automaton to be consumed and converted.
+            automaton: the automaton to be converted.
+            method: 'elimination' for state_elimination.eliminate, which
+                removes the cheapest state first and simplifies the
+                expressions as it goes, leaving the automaton untouched, or
+                'gnfa' for the vanilla, non-reduced algorithm, which removes
+                the states in any order. Either way, the automaton is only
+                read, so it needs no copy to be used afterwards.
 
         Returns:
             The transition from the new initial to the new final states will
             consist of the regular expression equivalent to the original
             automaton.
+
+        Raises:
+            ValueError: when the method is unknown.
         """
-        transitions = automaton.transitions
+        if method not in ('elimination', 'gnfa'):
+            raise ValueError("unknown conversion method: %s" % method)
+        if method == 'elimination':
+            return eliminate(automaton)
+
         states = {'i', 'f', frozenset()} | automaton.states
         init_state = automaton.init_state
         final_states = [set(x) for x in automaton.final_states]
@@ -414,11 +276,8 @@ class RegularExpression(object):
         for x in final_states:
             expr[frozenset(x), 'f'] = automaton.epsilon
 
-        old_transitions = transitions.copy()
-        transitions.clear()
-
-        for i in old_transitions:
-            transitions[frozenset(list(i)[0].split(','))] = old_transitions[i]
+        transitions = {frozenset(list(i)[0].split(',')): moves
+                       for i, moves in automaton.transitions.items()}
 
         for x in transitions:
             for t in transitions[x]:
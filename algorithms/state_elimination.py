@@ -0,0 +1,270 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""state_elimination.py
+
+Conversion of finite automata into regular expressions by state elimination.
+The automaton gets a new start and a new accept state, linked to the old ones
+by the empty word, and every other state is then removed, the edges through
+it being replaced by edges labelled with expressions. Only the predecessors
+and successors of the removed state are visited, and only they are recosted
+in the heap from which the cheapest state is removed first. The expressions
+are syntax trees simplified as they are built, so they stay as small as the
+order allows.
+
+Gustavo Zambonin & Matheus Ben-Hur de Melo Leite, UFSC, November 2015.
+"""
+
+import heapq
+from algorithms.regex_ast import EPSILON, Class, Concat, Epsilon, Star, \
+    Symbol, Union, class_label, is_class_label, letter_chars
+
+SPECIAL = "()|*[]\\" + EPSILON
+
+
+class Simplifier(object):
+    """Builds syntax trees through smart constructors that apply the
+    identities rε = εr = r, r|r = r, ε|r = r for a nullable r, (r|ε)* = r*
+    and r** = r*, and that merge alternated symbols into a single class.
+    Trees are hash-consed, so repeated subexpressions are shared and found
+    in constant time.
+
+    Attributes:
+        nodes: every node built, keyed by its structure.
+        info: the (number, nullable, size) of each node, keyed by its id,
+            where the number is the order in which the node was built and
+            the size counts the nodes of its tree.
+    """
+
+    def __init__(self):
+        """Inits Simplifier with the attributes introduced above."""
+        self.nodes, self.info = {}, {}
+        self.epsilon = self.node(('ε',), Epsilon, True, 1)
+
+    def node(self, key, make, nullable, size):
+        """Returns the unique node with the given structure, calling make
+        to build it when it does not exist yet.
+        """
+        found = self.nodes.get(key)
+        if found is None:
+            found = self.nodes[key] = make()
+            self.info[id(found)] = (len(self.nodes), nullable, size)
+        return found
+
+    def number(self, node):
+        """Returns the order in which the node was built."""
+        return self.info[id(node)][0]
+
+    def nullable(self, node):
+        """Checks whether the node accepts the empty word."""
+        return self.info[id(node)][1]
+
+    def size(self, node):
+        """Returns the number of nodes of the tree."""
+        return self.info[id(node)][2]
+
+    def letter(self, letter):
+        """Builds the leaf of a letter of an automaton, which is a class if
+        the letter is a class label and a symbol otherwise.
+        """
+        if letter == EPSILON:
+            return self.epsilon
+        if is_class_label(letter):
+            return self.chars(letter_chars(letter))
+        return self.node(('s', letter), lambda: Symbol(letter), False, 1)
+
+    def chars(self, chars):
+        """Builds the leaf that matches any symbol of a set."""
+        chars = frozenset(chars)
+        if len(chars) == 1:
+            return self.letter(next(iter(chars)))
+        return self.node(('c', chars), lambda: Class(chars), False, 1)
+
+    def concat(self, parts):
+        """Builds the concatenation of a list of trees."""
+        flat = []
+        for part in parts:
+            if isinstance(part, Concat):
+                flat.extend(part.parts)
+            elif part is not self.epsilon:
+                flat.append(part)
+        if not flat:
+            return self.epsilon
+        if len(flat) == 1:
+            return flat[0]
+        return self.node(('.',) + tuple(map(self.number, flat)),
+                         lambda: Concat(flat), all(map(self.nullable, flat)),
+                         1 + sum(map(self.size, flat)))
+
+    def union(self, parts):
+        """Builds the alternation of a list of trees."""
+        flat, chars = {}, set()
+        for part in parts:
+            for term in part.parts if isinstance(part, Union) else (part,):
+                if isinstance(term, Class):
+                    chars |= term.chars
+                elif isinstance(term, Symbol) and len(term.letter) == 1:
+                    chars.add(term.letter)
+                else:
+                    flat.setdefault(self.number(term), term)
+        if chars:
+            leaf = self.chars(chars)
+            flat.setdefault(self.number(leaf), leaf)
+        if len(flat) > 1 and self.number(self.epsilon) in flat and \
+                any(self.nullable(term) for term in flat.values()
+                    if term is not self.epsilon):
+            del flat[self.number(self.epsilon)]
+        terms = list(flat.values())
+        if len(terms) == 1:
+            return terms[0]
+        return self.node(('|',) + tuple(sorted(flat)), lambda: Union(terms),
+                         any(map(self.nullable, terms)),
+                         1 + sum(map(self.size, terms)))
+
+    def star(self, part):
+        """Builds the Kleene closure of a tree."""
+        if isinstance(part, Union) and self.epsilon in part.parts:
+            part = self.union([term for term in part.parts
+                               if term is not self.epsilon])
+        if part is self.epsilon or isinstance(part, Star):
+            return part
+        return self.node(('*', self.number(part)), lambda: Star(part), True,
+                         1 + self.size(part))
+
+
+def to_string(tree):
+    """Writes a syntax tree as a regular expression that regex_ast.parse
+    reads back, with parentheses only where the priorities need them.
+    """
+    def wrap(node, needed):
+        return [")", node, "("] if needed else [node]
+
+    out, stack = [], [tree]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, str):
+            out.append(node)
+        elif isinstance(node, Symbol):
+            out.append("\\" + node.letter if node.letter in SPECIAL
+                       else node.letter)
+        elif isinstance(node, Class):
+            out.append(class_label(node.chars))
+        elif isinstance(node, Epsilon):
+            out.append(EPSILON)
+        elif isinstance(node, Star):
+            part = node.part
+            simple = isinstance(part, Class) or \
+                isinstance(part, Symbol) and len(part.letter) == 1
+            stack.append("*")
+            stack.extend(wrap(part, not simple))
+        elif isinstance(node, Concat):
+            for part in reversed(node.parts):
+                stack.extend(wrap(part, isinstance(part, Union)))
+        else:
+            for i, part in enumerate(reversed(node.parts)):
+                if i:
+                    stack.append("|")
+                stack.append(part)
+    return "".join(out)
+
+
+def eliminate(automaton):
+    """Converts a finite automaton into a regular expression. The states that
+    cannot be reached from the start, or cannot reach an accept state, are
+    dropped first. Then, while any old state is left, the one with the fewest
+    pairs of predecessor and successor is removed, the total size of the
+    expressions on its edges breaking ties, and each such pair (p, q) gets
+    the edge p -> q united with the concatenation of p -> s, (s -> s)* and
+    s -> q.
+
+    Arguments:
+        automaton: a FiniteAutomaton, in any of its forms. It is not changed.
+
+    Returns:
+        The regular expression of the language of the automaton, as a
+        string, or None if the language is empty.
+    """
+    keys, moves, resolve = automaton.indexed_transitions()
+    start, end = len(keys), len(keys) + 1
+    simplifier = Simplifier()
+    succ = [{} for _ in range(len(keys) + 2)]
+    pred = [{} for _ in range(len(keys) + 2)]
+
+    def link(source, dest, tree):
+        old = succ[source].get(dest)
+        if old is not None:
+            tree = simplifier.union([old, tree])
+        succ[source][dest] = pred[dest][source] = tree
+
+    def numbers(state):
+        return resolve([state] if isinstance(state, str) else state)
+
+    for source, move in enumerate(moves):
+        for letter, dests in move.items():
+            for dest in dests:
+                link(source, dest, simplifier.epsilon
+                     if letter == automaton.epsilon
+                     else simplifier.letter(letter))
+    if automaton.init_state:
+        for state in numbers(automaton.init_state):
+            link(start, state, simplifier.epsilon)
+    for final in automaton.final_states:
+        for state in numbers(final):
+            link(state, end, simplifier.epsilon)
+
+    def reach(origin, edges):
+        seen, stack = {origin}, [origin]
+        while stack:
+            for other in edges[stack.pop()]:
+                if other not in seen:
+                    seen.add(other)
+                    stack.append(other)
+        return seen
+
+    useful = reach(start, succ) & reach(end, pred)
+    if end not in useful:
+        return None
+    for state in range(len(keys) + 2):
+        if state not in useful:
+            for other in succ[state]:
+                del pred[other][state]
+            for other in pred[state]:
+                del succ[other][state]
+            succ[state], pred[state] = {}, {}
+
+    def cost(state):
+        ins, outs = len(pred[state]), len(succ[state])
+        if state in succ[state]:
+            ins, outs = ins - 1, outs - 1
+        weight = sum(map(simplifier.size, pred[state].values())) + \
+            sum(map(simplifier.size, succ[state].values()))
+        return ins * outs, weight, state
+
+    # the current cost of each state left, and a heap of costs where the
+    # outdated entries are skipped as they come up
+    costs = {state: cost(state) for state in useful - {start, end}}
+    heap = list(costs.values())
+    heapq.heapify(heap)
+    while heap:
+        entry = heapq.heappop(heap)
+        state = entry[2]
+        if costs.get(state) != entry:
+            continue
+        del costs[state]
+        loop = succ[state].pop(state, None)
+        pred[state].pop(state, None)
+        middle = [simplifier.star(loop)] if loop is not None else []
+        for source, first in pred[state].items():
+            del succ[source][state]
+            for dest, last in succ[state].items():
+                link(source, dest, simplifier.concat([first] + middle +
+                                                     [last]))
+        for dest in succ[state]:
+            del pred[dest][state]
+        # only the edges of the neighbours have changed
+        for other in set(pred[state]) | set(succ[state]):
+            if other in costs:
+                costs[other] = cost(other)
+                heapq.heappush(heap, costs[other])
+        succ[state], pred[state] = {}, {}
+    return to_string(succ[start][end])
@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""thompson.py
+
+Thompson's construction over integer states. Every state of a construction is
+a number taken from a single counter, and its transitions are kept in a list
+that only grows, so joining two pieces of automata adds a few epsilon-moves
+instead of renaming and copying both of them.
+
+Gustavo Zambonin & Matheus Ben-Hur de Melo Leite, UFSC, November 2015.
+"""
+
+from algorithms.finite_automaton import FiniteAutomaton
+from algorithms.regex_ast import Class, Epsilon, Star, Symbol, Union, \
+    leaf_letters, partition
+
+
+class Fragment(object):
+    """A piece of automaton under construction, which accepts when a path
+    from its start state reaches one of its accept states.
+
+    Attributes:
+        start: the number of the start state.
+        accepts: a tuple with the numbers of the accept states.
+    """
+
+    __slots__ = ('start', 'accepts')
+
+    def __init__(self, start, accepts):
+        """Inits Fragment with the attributes introduced above."""
+        self.start = start
+        self.accepts = tuple(accepts)
+
+
+class Thompson(object):
+    """Builds fragments that share the same space of states. Fragments must
+    not be used twice in the same expression, since the operations link them
+    in place.
+
+    Attributes:
+        moves: the transitions of each state, as lists of pairs (symbol,
+            destination), indexed by the number of the state.
+        tags: the kind of word recognized by some accept states, as in
+            FiniteAutomaton.tags, indexed by their number.
+        alphabet: every symbol seen so far, except for epsilon.
+    """
+
+    epsilon = "ε"
+
+    def __init__(self):
+        """Inits Thompson with the attributes introduced above."""
+        self.moves, self.tags, self.alphabet = [], {}, set()
+
+    def state(self):
+        """Creates a new state and returns its number."""
+        self.moves.append([])
+        return len(self.moves) - 1
+
+    def symbol(self, *letters):
+        """Builds the fragment that accepts only the given symbols, each of
+        them as a word of a single letter.
+        """
+        start, accept = self.state(), self.state()
+        for letter in letters:
+            self.moves[start].append((letter, accept))
+            if letter != self.epsilon:
+                self.alphabet.add(letter)
+        return Fragment(start, (accept,))
+
+    def empty(self):
+        """Builds the fragment that accepts only the empty word."""
+        start = self.state()
+        return Fragment(start, (start,))
+
+    def concat(self, first, second):
+        """Builds the concatenation of two fragments."""
+        for accept in first.accepts:
+            self.moves[accept].append((self.epsilon, second.start))
+        return Fragment(first.start, second.accepts)
+
+    def union(self, fragments):
+        """Builds the alternation of any number of fragments, keeping all of
+        their accept states (and thus their tags).
+        """
+        start = self.state()
+        accepts = []
+        for fragment in fragments:
+            self.moves[start].append((self.epsilon, fragment.start))
+            accepts.extend(fragment.accepts)
+        return Fragment(start, accepts)
+
+    def join(self, fragment):
+        """Merges the accept states of a fragment into a single new one."""
+        if len(fragment.accepts) == 1:
+            return fragment
+        accept = self.state()
+        for state in fragment.accepts:
+            self.moves[state].append((self.epsilon, accept))
+        return Fragment(fragment.start, (accept,))
+
+    def star(self, fragment):
+        """Builds the Kleene closure of a fragment. The new start state is
+        also an accept state, and every old accept state moves back to it.
+        """
+        start = self.state()
+        self.moves[start].append((self.epsilon, fragment.start))
+        for accept in fragment.accepts:
+            self.moves[accept].append((self.epsilon, start))
+        return Fragment(start, (start,) + fragment.accepts)
+
+    def expression(self, tree, atoms=None):
+        """Builds the fragment of a regular expression from its syntax tree,
+        visiting the nodes with an explicit stack instead of recursion.
+
+        Arguments:
+            tree: the root of a syntax tree, as given by regex_ast.parse.
+            atoms: the letters of the symbols, as given by
+                regex_ast.partition, which must have seen the tree. By
+                default, the atoms of the tree alone are used.
+
+        Returns:
+            The fragment that accepts the language of the expression.
+        """
+        if atoms is None:
+            atoms = partition([tree])
+        done, stack = [], [(tree, False)]
+        while stack:
+            node, visited = stack.pop()
+            if isinstance(node, (Symbol, Class)):
+                done.append(self.symbol(*leaf_letters(node, atoms)))
+            elif isinstance(node, Epsilon):
+                done.append(self.empty())
+            elif not visited:
+                stack.append((node, True))
+                children = (node.part,) if isinstance(node, Star) else \
+                    node.parts
+                stack.extend((child, False) for child in reversed(children))
+            elif isinstance(node, Star):
+                done.append(self.star(done.pop()))
+            else:
+                parts = done[len(done) - len(node.parts):]
+                del done[len(done) - len(node.parts):]
+                if isinstance(node, Union):
+                    done.append(self.join(self.union(parts)))
+                else:
+                    fragment = parts[0]
+                    for part in parts[1:]:
+                        fragment = self.concat(fragment, part)
+                    done.append(fragment)
+        return done.pop()
+
+    def include(self, automaton):
+        """Copies a finite automaton into the construction.
+
+        Arguments:
+            automaton: a FiniteAutomaton, in any of its forms.
+
+        Returns:
+            The fragment equivalent to the automaton, its tags included.
+        """
+        keys, moves, resolve = automaton.indexed_transitions()
+        offset = len(self.moves)
+
+        def numbers(state):
+            return [offset + i for i in
+                    resolve([state] if isinstance(state, str) else state)]
+
+        init, accepts = numbers(automaton.init_state), []
+        for state in automaton.final_states:
+            accepts += numbers(state)
+        for state, tag in automaton.tags.items():
+            for i in numbers(state):
+                self.tags[i] = min(tag, self.tags.get(i, tag))
+
+        moves += [{} for _ in range(len(keys) - len(moves))]
+        for move in moves:
+            self.moves.append([(letter, offset + dest) for letter, dests
+                               in move.items() for dest in dests])
+        self.alphabet |= automaton.alphabet - {self.epsilon}
+        if len(init) == 1:
+            start = init[0]
+        else:
+            start = self.state()
+            self.moves[start] += [(self.epsilon, i) for i in init]
+        return Fragment(start, dict.fromkeys(accepts))
+
+    def to_automaton(self, fragment):
+        """Extracts the states reachable from the start of a fragment as a
+        nondeterministic finite automaton, with states named q0, q1, ...
+        in the order they are found.
+
+        Returns:
+            The equivalent FiniteAutomaton.
+        """
+        number, order = {fragment.start: 0}, [fragment.start]
+        for state in order:
+            for letter, dest in self.moves[state]:
+                if dest not in number:
+                    number[dest] = len(order)
+                    order.append(dest)
+
+        names = ['q%d' % i for i in range(len(order))]
+        transitions = {}
+        for i, state in enumerate(order):
+            row = {letter: set() for letter in self.alphabet}
+            for letter, dest in self.moves[state]:
+                row.setdefault(letter, set()).add(names[number[dest]])
+            transitions[frozenset([names[i]])] = row
+
+        finals = [state for state in fragment.accepts if state in number]
+        return FiniteAutomaton(
+            set(names), set(self.alphabet), transitions, names[0],
+            {frozenset([names[number[s]]]) for s in finals},
+            {frozenset([names[number[s]]]): self.tags[s]
+             for s in finals if s in self.tags})
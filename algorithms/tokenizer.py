@@ -8,7 +8,12 @@ A simple text segmentation utility for the lexical analysis part of a compiler.
 Gustavo Zambonin & Matheus Ben-Hur de Melo Leite, UFSC, November 2015.
 """
 
-from algorithms.complex_builder import Builder
+from algorithms.compiled_automaton import DEAD
+from algorithms.complex_builder import compiled_lexer, shared_builder
+from algorithms.lazy_automaton import LazyAutomaton
+
+ERROR = 'ERROR'
+WHITESPACE = frozenset(" \t\r\n")
 
 
 class Tokenizer(object):
@@ -17,23 +22,30 @@ class Tokenizer(object):
     it with words accepted by a finite automaton.
 
     Attributes:
-        automaton: the means by which the words are computed.
-        input_file: a text file with source code for the language.
+        automaton: the means by which the words are computed, compiled to a
+            transition table so each character costs a single lookup (and
+            cached on disk between runs). If lazy is set, the union of the
+            lexical structure is determinized on the fly instead, only where
+            the scan reaches. An automaton may also be given directly, such
+            as one loaded from its serialized form.
+        input_file: a text file with source code for the language, which may
+            be None when the source is streamed through tokenize instead.
+        munch: if set, lexemes are split by maximal munch (the longest
+            prefix accepted by the automaton) instead of at the separators,
+            so 1+1 is read as three tokens.
     """
 
-    def __init__(self, input_file):
+    def __init__(self, input_file=None, lazy=False, munch=False,
+                 automaton=None):
         """Inits Tokenizer with the attributes introduced above."""
         self.input_file = input_file
-        self.words = {
-            'RSWD': ['else', 'if', 'while', 'read', 'write',
-                     'list', 'bool', 'str', 'int'],
-            'BOOL': ['False', 'True'],
-            'AROP': ['+', '-', '×', '/'],
-            'LGOP': ['and', 'or', 'not'],
-            'CPOP': ['<', '>', '==', '>=', '<=', '!='],
-            'ATOP': ['=', '->', ':='],
-        }
-        self.automaton = Builder().final_aut
+        self.munch = munch
+        if automaton is not None:
+            self.automaton = automaton
+        elif lazy:
+            self.automaton = LazyAutomaton(shared_builder().nfa_aut)
+        else:
+            self.automaton = compiled_lexer()
 
     def analyze(self):
         """Reads lexemes from a file and transforms them in tokens.
@@ -44,83 +56,185 @@ class Tokenizer(object):
             structure) and a list of words that could not be understood by
             the automaton. along with their placement on the source file.
         """
-        with open(self.input_file, 'r') as file:
-            tokens, errors, separators = [], [], ["\n", " "]
-            line_number = 0
+        return split_errors(self.tokenize(), self.input_file)
 
-            if isinstance(self.automaton.init_state, str):
-                reset = frozenset([self.automaton.init_state])
-            else:
-                reset = frozenset(self.automaton.init_state)
+    def tokenize(self, source=None):
+        """Reads lexemes from a text stream and yields them as tokens, one at
+        a time, so the memory used does not depend on the size of the input.
+
+        Arguments:
+            source: a file object or any iterable of text chunks, which may
+                split lines and lexemes anywhere. The input file is read when
+                it is omitted.
+
+        Yields:
+            Tuples (lexeme, kind, line, column), where kind is the lexeme's
+            classification within the lexical structure, or ERROR for the
+            words that could not be understood by the automaton. Lines and
+            columns start at 1.
+        """
+        if source is None:
+            with open(self.input_file, 'r') as file:
+                for token in self.tokenize(file):
+                    yield token
+            return
+
+        scan = self.scan_longest if self.munch else self.scan_line
+        for line_number, line in enumerate(read_lines(source), 1):
+            for token in scan(line, line_number):
+                yield token
+
+    def scan_longest(self, line, line_number):
+        """Splits a single line in lexemes by maximal munch: from each
+        position, the automaton runs while it can, remembering the last
+        position where it was in an accept state, and the lexeme ends there.
+        Whitespace between lexemes is skipped, and characters from which no
+        lexeme can start are gathered into a single error.
+
+        Arguments:
+            line: the text of the line, with or without its line break.
+            line_number: the position of the line in the source.
 
-            while True:
-                line = file.readline()
-                if not line:
+        Yields:
+            The tokens of the line, as described in tokenize.
+        """
+        automaton = self.automaton
+        init, end = automaton.init_state, len(line)
+        pos, error = 0, None
+
+        while pos < end:
+            if line[pos] in WHITESPACE:
+                if error is not None:
+                    yield line[error:pos], ERROR, line_number, error + 1
+                    error = None
+                pos += 1
+                continue
+
+            state, i, last, kind = init, pos, -1, None
+            while i < end:
+                state = automaton.step(state, line[i])
+                if state == DEAD:
                     break
-                line_number += 1
-                curr_state, word = reset, ""
-                for letter in line:
-                    if ((curr_state == frozenset() or curr_state == set())
-                       and letter not in separators):
+                i += 1
+                if automaton.is_final(state):
+                    last, kind = i, automaton.tag(state)
+
+            if last == -1:
+                if error is None:
+                    error = pos
+                pos += 1
+                continue
+            if error is not None:
+                yield line[error:pos], ERROR, line_number, error + 1
+                error = None
+            yield line[pos:last], kind, line_number, pos + 1
+            pos = last
+
+        if error is not None:
+            yield line[error:end], ERROR, line_number, error + 1
+
+    def scan_line(self, line, line_number):
+        """Splits a single line in lexemes at the separators and runs each of
+        them through the automaton. Strings may contain spaces, but never
+        span more than one line.
+
+        Arguments:
+            line: the text of the line, with or without its line break.
+            line_number: the position of the line in the source.
+
+        Yields:
+            The tokens of the line, as described in tokenize.
+        """
+        separators = ["\n", " "]
+        automaton = self.automaton
+        reset = automaton.init_state
+        curr_state, word, start = reset, "", 0
+        if not line.endswith("\n"):
+            line += "\n"
+
+        for column, letter in enumerate(line, 1):
+            if curr_state == DEAD and letter not in separators:
+                word += str(letter)
+            elif letter in separators:
+                if len(word) > 0 and "\"" not in word[0]:
+                    if automaton.is_final(curr_state):
+                        yield (word, automaton.tag(curr_state), line_number,
+                               start)
+                        curr_state = reset
+                        word = ""
+                    elif word:
+                        yield word, ERROR, line_number, start
+                        curr_state = reset
+                        word = ""
+                if len(word) != 0:
+                    if letter != "\n":
                         word += str(letter)
-                    elif letter in separators:
-                        if len(word) > 0 and "\"" not in word[0]:
-                            if curr_state in self.automaton.final_states:
-                                type = [i for i in self.words
-                                        if word in self.words[i]]
-                                if type:
-                                    tokens.append((word, type[0]))
-                                elif word.isdigit():
-                                    tokens.append((word, 'INTG'))
-                                else:
-                                    tokens.append((word, 'IDNT'))
-                                curr_state = reset
-                                word = ""
-                            elif word:
-                                errors.append("{}:{} '{}' not recognized"
-                                              .format(self.input_file,
-                                                      line_number, word))
-                                curr_state = reset
-                                word = ""
-                        if len(word) != 0:
-                            if letter != "\n":
-                                word += str(letter)
-                                try:
-                                    curr_state = frozenset(
-                                        self.automaton.transitions
-                                        [curr_state][letter])
-                                except (KeyError, TypeError):
-                                    curr_state = set()
-                            else:
-                                errors.append("{}:{} '{}' not recognized"
-                                              .format(self.input_file,
-                                                      line_number, word))
-                                curr_state = reset
-                                word = ""
+                        curr_state = automaton.step(curr_state, letter)
+                    else:
+                        yield word, ERROR, line_number, start
+                        curr_state = reset
+                        word = ""
+            else:
+                if not word:
+                    start = column
+                if letter == "\"" and word and word[0] == "\"":
+                    word += str(letter)
+                    curr_state = automaton.step(curr_state, letter)
+                    if automaton.is_final(curr_state):
+                        yield (word, automaton.tag(curr_state), line_number,
+                               start)
                     else:
-                        if letter == "\"" and word and word[0] == "\"":
-                            word += str(letter)
-                            try:
-                                curr_state = frozenset(
-                                    self.automaton.transitions
-                                    [curr_state][letter])
-                                if curr_state in self.automaton.final_states:
-                                    tokens.append((word, 'STRG'))
-                                else:
-                                    errors.append("{}:{} '{}' not recognized"
-                                                  .format(self.input_file,
-                                                          line_number, word))
-                            except KeyError:
-                                curr_state = set()
-                            curr_state = reset
-                            word = ""
-                        else:
-                            word += str(letter)
-                            try:
-                                curr_state = frozenset(
-                                    self.automaton.transitions
-                                    [curr_state][letter])
-                            except (KeyError, TypeError):
-                                curr_state = set()
-
-            return tokens, errors
+                        yield word, ERROR, line_number, start
+                    curr_state = reset
+                    word = ""
+                else:
+                    word += str(letter)
+                    curr_state = automaton.step(curr_state, letter)
+
+
+def read_lines(source, size=65536):
+    """Cuts a text stream in lines, regardless of how it is chunked.
+
+    Arguments:
+        source: a file object (read in blocks of the given size) or any
+            iterable of text chunks.
+        size: how many characters are requested from a file at a time.
+
+    Yields:
+        Every line of the stream, along with its line break if it has one.
+    """
+    chunks = source
+    if hasattr(source, 'read'):
+        chunks = iter(lambda: source.read(size), '')
+    pending = []
+    for chunk in chunks:
+        lines = chunk.split("\n")
+        for line in lines[:-1]:
+            pending.append(line)
+            yield "".join(pending) + "\n"
+            pending = []
+        if lines[-1]:
+            pending.append(lines[-1])
+    if pending:
+        yield "".join(pending)
+
+
+def split_errors(tokens, path):
+    """Separates the recognized tokens from the unrecognized words.
+
+    Arguments:
+        tokens: tuples (lexeme, kind, line, column), as given by
+            Tokenizer.tokenize.
+        path: the name of the analyzed file, used in the error messages.
+
+    Returns:
+        The tuple described in Tokenizer.analyze.
+    """
+    words, errors = [], []
+    for lexeme, kind, line, column in tokens:
+        if kind == ERROR:
+            errors.append("{}:{} '{}' not recognized"
+                          .format(path, line, lexeme))
+        else:
+            words.append((lexeme, kind))
+    return words, errors
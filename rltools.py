@@ -14,7 +14,6 @@ from algorithms.finite_automaton import FiniteAutomaton
 from algorithms.io_manager import load, save, read_source
 from algorithms.regular_expression import RegularExpression
 from algorithms.regular_grammar import RegularGrammar
-from algorithms.tokenizer import Tokenizer
 from algorithms.ll_parser import Parser, derive
 
 if __name__ == '__main__':
@@ -23,13 +22,19 @@ if __name__ == '__main__':
         raise SystemExit
 
     possible_commands = ["--dfa", "--gta", "--atg", "--rta",
-                         "--atr", "--min", "--lex", "--syn"]
+                         "--atr", "--min", "--lex", "--syn", "--mat",
+                         "--par", "--cvt", "--int", "--dif", "--sdf",
+                         "--cmp"]
 
     if len(set(sys.argv).intersection(possible_commands)) > 1:
         print("Only one flag is permitted at a time.")
+        raise SystemExit
 
     if sys.argv[1] not in possible_commands:
         print("Invalid command.")
+        raise SystemExit
+
+    indent = None if "--compact" in sys.argv else 4
 
     if len(sys.argv) > 2:
         if "--dfa" in sys.argv:
@@ -41,7 +46,7 @@ if __name__ == '__main__':
                     savepath = re.sub('/', r'/afd-', outpath)
                 else:
                     savepath = 'afd-' + outpath
-                save(savepath, 'automaton', aut)
+                save(savepath, 'automaton', aut, indent)
                 print("DFA saved in %s!" % savepath)
             else:
                 print("Input must be an automaton.")
@@ -55,7 +60,7 @@ if __name__ == '__main__':
                     savepath = re.sub('/', r'/afd-', outpath)
                 else:
                     savepath = 'afd-' + outpath
-                save(savepath, 'automaton', aut)
+                save(savepath, 'automaton', aut, indent)
                 print("DFA saved in %s!" % savepath)
             else:
                 print("Input must be a grammar.")
@@ -69,7 +74,7 @@ if __name__ == '__main__':
                     savepath = re.sub('/', r'/gr-', outpath)
                 else:
                     savepath = 'gr-' + outpath
-                save(savepath, 'grammar', grm)
+                save(savepath, 'grammar', grm, indent)
                 print("GR saved in %s!" % savepath)
             else:
                 print("Input must be an automaton.")
@@ -78,9 +83,13 @@ if __name__ == '__main__':
             reg = sys.argv[2]
             if type(reg) is str:
                 regexp = RegularExpression(reg)
-                aut = RegularExpression.regexp_to_automaton(regexp)
+                method = 'thompson'
+                for option in ['glushkov', 'brzozowski']:
+                    if "--" + option in sys.argv:
+                        method = option
+                aut = RegularExpression.regexp_to_automaton(regexp, method)
                 savepath = "tests/afnd-reg.out"
-                save(savepath, 'automaton', aut)
+                save(savepath, 'automaton', aut, indent)
                 print("Automaton saved in %s!" % savepath)
             else:
                 print("Input must be a regular expression.")
@@ -88,13 +97,14 @@ if __name__ == '__main__':
         elif "--atr" in sys.argv:
             aut = load(sys.argv[2])
             if type(aut) is FiniteAutomaton:
-                reg = RegularExpression.automaton_to_regexp(aut)
+                method = 'gnfa' if "--gnfa" in sys.argv else 'elimination'
+                reg = RegularExpression.automaton_to_regexp(aut, method)
                 outpath = re.sub(r'.in', r'.out', sys.argv[2])
                 if '/' in outpath:
                     savepath = re.sub('/', r'/re-', outpath)
                 else:
                     savepath = 're-' + outpath
-                save(savepath, 'regexp', reg)
+                save(savepath, 'regexp', reg, indent)
                 print("RE saved in %s!" % savepath)
             else:
                 print("Input must be an automaton.")
@@ -108,25 +118,143 @@ if __name__ == '__main__':
                     savepath = re.sub('/', r'/min-', outpath)
                 else:
                     savepath = 'min-' + outpath
-                save(savepath, 'automaton', aut)
+                save(savepath, 'automaton', aut, indent)
                 print("DFA saved in %s!" % savepath)
             else:
                 print("Input must be an automaton.")
 
+        elif set(sys.argv) & {"--int", "--dif", "--sdf", "--cmp"}:
+            from algorithms.product import complement, difference, \
+                intersection, symmetric_difference
+            from algorithms.regex_ast import is_class_label, letter_chars
+            command = next(flag for flag in ("--int", "--dif", "--sdf",
+                                             "--cmp") if flag in sys.argv)[2:]
+            inputs = [arg for arg in sys.argv[2:] if not arg.startswith("--")]
+            aut = load(inputs[0]) if inputs else None
+            other = None
+            if command != 'cmp' and len(inputs) > 1:
+                other = load(inputs[1])
+            if type(aut) is not FiniteAutomaton or \
+                    command != 'cmp' and type(other) is not FiniteAutomaton:
+                print("Inputs must be automata.")
+            else:
+                if command == 'int':
+                    aut = intersection(aut, other)
+                elif command == 'dif':
+                    aut = difference(aut, other)
+                elif command == 'sdf':
+                    aut = symmetric_difference(aut, other)
+                else:
+                    extra = inputs[1] if len(inputs) > 1 else ""
+                    aut = complement(aut, letter_chars(extra)
+                                     if is_class_label(extra) else extra)
+                outpath = re.sub('.in', r'.out', inputs[0])
+                if '/' in outpath:
+                    savepath = re.sub('/', r'/%s-' % command, outpath)
+                else:
+                    savepath = command + '-' + outpath
+                save(savepath, 'automaton', aut, indent)
+                print("DFA saved in %s!" % savepath)
+
         elif "--lex" in sys.argv:
-            lexer = Tokenizer(sys.argv[2])
-            output = lexer.analyze()
-            print('\nTokens')
-            for i in range(0, len(output[0]), 5):
-                print(output[0][i:i+5])
-            print('\nErrors')
-            for e in output[1]:
-                print(e)
-            print()
+            import os
+            from algorithms.tokenizer import Tokenizer, split_errors
+            from algorithms.parallel_lexer import lex_files, \
+                lex_large_file, source_files
+            targets = [arg for arg in sys.argv[2:] if not arg.startswith("--")]
+            lazy, munch = "--lazy" in sys.argv, "--munch" in sys.argv
+            many = len(targets) > 1 or targets and os.path.isdir(targets[0])
+            if not targets:
+                print("Input file is missing.")
+                results = []
+            elif many:
+                results = lex_files(source_files(targets), munch=munch,
+                                    lazy=lazy)
+            elif os.path.getsize(targets[0]) < 8 << 20:
+                lexer = Tokenizer(targets[0], lazy=lazy, munch=munch)
+                results = [(targets[0], lexer.tokenize())]
+            else:
+                results = [(targets[0], lex_large_file(targets[0],
+                                                       munch=munch,
+                                                       lazy=lazy))]
+            for path, tokens in results:
+                if many:
+                    print('\n==> %s <==' % path)
+                output = split_errors(tokens, path)
+                print('\nTokens')
+                for i in range(0, len(output[0]), 5):
+                    print(output[0][i:i+5])
+                print('\nErrors')
+                for e in output[1]:
+                    print(e)
+                print()
+            if "--stats" in sys.argv:
+                from algorithms.complex_builder import compiled_lexer
+                stats = compiled_lexer().stats()
+                print("Lexer: %(states)d states, %(columns)d columns "
+                      "(%(columns_before)d before compression), "
+                      "%(table_bytes)d bytes of table, %(bytes_saved)d "
+                      "saved." % stats)
+
+        elif "--mat" in sys.argv:
+            from algorithms.binary_format import is_container, load_compiled
+            from algorithms.compiled_automaton import CompiledAutomaton
+            aut = None
+            if is_container(sys.argv[2]):
+                try:
+                    aut = load_compiled(sys.argv[2])
+                except ValueError:
+                    pass
+            if aut is None:
+                aut = load(sys.argv[2])
+            if type(aut) not in (FiniteAutomaton, CompiledAutomaton):
+                print("Input must be an automaton.")
+            elif len(sys.argv) < 4:
+                print("Words file is missing.")
+            else:
+                from algorithms.batch_matcher import match_batch
+                if type(aut) is FiniteAutomaton:
+                    aut.determinize()
+                with open(sys.argv[3]) as words_file:
+                    words = words_file.read().splitlines()
+                matches = match_batch(aut, words)
+                for word, match in zip(words, matches):
+                    print("%s: %s" % (word, "accepted" if match
+                                      else "rejected"))
+                print("%d of %d words accepted." % (sum(matches),
+                                                     len(words)))
+
+        elif "--cvt" in sys.argv:
+            import os
+            from algorithms.binary_format import is_container, \
+                write_container
+            obj = load(sys.argv[2])
+            binary = not is_container(sys.argv[2])
+            outpaths = [arg for arg in sys.argv[3:]
+                        if not arg.startswith("--")]
+            if outpaths:
+                savepath = outpaths[0]
+            else:
+                savepath = os.path.splitext(sys.argv[2])[0] + \
+                    ('.rlb' if binary else '.json')
+            if type(obj) not in (FiniteAutomaton, RegularGrammar):
+                print("Input must be an automaton or a grammar.")
+            elif binary:
+                write_container(savepath, obj)
+                print("Container saved in %s!" % savepath)
+            else:
+                save(savepath, 'automaton' if type(obj) is FiniteAutomaton
+                     else 'grammar', obj, indent)
+                print("JSON saved in %s!" % savepath)
 
         elif "--syn" in sys.argv:
             source = read_source(sys.argv[2])
             print(derive(Parser().grammar, source))
 
+        elif "--par" in sys.argv:
+            from algorithms.tokenizer import Tokenizer
+            lexer = Tokenizer(sys.argv[2], munch="--munch" in sys.argv)
+            print(Parser().parse(lexer.tokenize()))
+
     else:
         print("Input file is missing.")
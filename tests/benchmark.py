@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""benchmark.py
+
+Compares the construction methods of RegularExpression.regexp_to_automaton,
+timing each one on its own and followed by a determinization, over the
+expressions of the lexical structure and a few synthetic ones. Then compares
+the methods of RegularExpression.automaton_to_regexp, by time and length of
+the expression found, over minimal automata of growing size.
+
+    python3 tests/benchmark.py [repetitions]
+
+Gustavo Zambonin & Matheus Ben-Hur de Melo Leite, UFSC, November 2015.
+"""
+
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+from algorithms.complex_builder import Builder
+from algorithms.finite_automaton import FiniteAutomaton
+from algorithms.regular_expression import RegularExpression
+
+METHODS = ['thompson', 'glushkov', 'brzozowski']
+CONVERSIONS = ['elimination', 'gnfa']
+
+
+def expressions():
+    """Returns pairs (name, expression) with the benchmarked expressions."""
+    rnd = random.Random(2015)
+    words = "|".join("".join(rnd.choice("abcdef") for _ in range(6))
+                     for _ in range(2000))
+    nested = "(a|b)*" * 10 + "c" + "(a|bc)*" * 10
+    deep = "(" * 500 + "a|b" + ")*" * 500
+    return [('keywords', Builder.keywords), ('operators', Builder.ops),
+            ('letters', Builder.letters), ('string_char', Builder.string_char),
+            ('2000 words', words), ('nested stars', nested),
+            ('500 groups', deep)]
+
+
+def automata():
+    """Returns pairs (name, automaton) with the benchmarked automata, which
+    are minimal and have their states written as sets of a single name, the
+    form loaded from files such as tests/astar.in.
+    """
+    pairs = [('(a|b)*abb', "(a|b)*abb"),
+             ('(ab|ba)*(a|ε)b*', "(ab|ba)*(a|ε)b*")]
+    pairs += [('n-th last a, n=%d' % n, "(a|b)*a" + "(a|b)" * (n - 1))
+              for n in range(2, 6)]
+    result = []
+    for name, expression in pairs:
+        aut = RegularExpression(expression).regexp_to_automaton()
+        aut.determinize()
+        aut.minimize()
+        keys = {state: frozenset([state]) for state in aut.states}
+        result.append((name, FiniteAutomaton(
+            set(keys.values()), aut.alphabet,
+            {keys[state]: {letter: set(dest) for letter, dest in
+                           aut.transitions[frozenset([state])].items()}
+             for state in aut.states},
+            keys[aut.init_state],
+            {frozenset(final) for final in aut.final_states})))
+    return result
+
+
+def measure_conversion(aut, method, repetitions):
+    """Returns the best time, in milliseconds, among the repetitions, and
+    the length of the expression found.
+    """
+    result = RegularExpression.automaton_to_regexp(aut, method)
+    times = timeit.repeat(
+        lambda: RegularExpression.automaton_to_regexp(aut, method),
+        number=1, repeat=repetitions)
+    return min(times) * 1000, len(result or "")
+
+
+def measure(expression, method, determinize, repetitions):
+    """Returns the best time, in milliseconds, among the repetitions."""
+    def run():
+        aut = RegularExpression(expression).regexp_to_automaton(method)
+        if determinize:
+            aut.determinize()
+    return min(timeit.repeat(run, number=1, repeat=repetitions)) * 1000
+
+
+if __name__ == '__main__':
+    repetitions = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    header = "%-14s %-6s" % ("expression", "step") + \
+        "".join("%12s" % method for method in METHODS)
+    print(header)
+    print("-" * len(header))
+    for name, expression in expressions():
+        for step, determinize in [("build", False), ("+det", True)]:
+            times = [measure(expression, method, determinize, repetitions)
+                     for method in METHODS]
+            print("%-14s %-6s" % (name, step) +
+                  "".join("%10.1fms" % t for t in times))
+
+    print()
+    header = "%-20s %6s" % ("automaton", "states") + \
+        "".join("%22s" % method for method in CONVERSIONS)
+    print(header)
+    print("-" * len(header))
+    for name, aut in automata():
+        results = [measure_conversion(aut, method, repetitions)
+                   for method in CONVERSIONS]
+        print("%-20s %6d" % (name, len(aut.states)) +
+              "".join("%10.1fms %7d sym" % result for result in results))